@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark de CPU de GET /analytics/summary sobre el frame columnar
+
+Mide, para períodos de distinto largo, lo que cuesta construir el
+DailyStatsFrame desde documentos crudos (lo que devuelve Motor) y ejecutar
+los cálculos del resumen que usan días (el progreso mensual se lee de
+MonthlyStats), y el costo de las tendencias incrementales. Como referencia muestra también lo que cuesta
+solo validar esos documentos con Pydantic, como hacía la carga anterior con
+DailyStats.find(...).to_list(). No usa MongoDB.
+
+Uso (desde backend/):
+    python benchmarks/bench_analytics.py
+"""
+
+import random
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from beanie import PydanticObjectId
+
+from models.analytics import DailyStatsView
+from models.user import User, UserProfile
+from services.analytics_engine import (
+    DailyStatsFrame, achievements, recommendations, consistency_metrics
+)
+from services.trend_engine import TrendState, TREND_METRICS, weekly_trends
+
+ITERATIONS = 200
+PERIODS = [30, 90, 365, 730]
+
+def _rows(days: int) -> list:
+    """Documentos crudos con algunos días sin registro y métricas de salud dispersas"""
+    rng = random.Random(days)
+    start = date.today() - timedelta(days=days - 1)
+    rows = []
+    for offset in range(days):
+        if rng.random() < 0.15:
+            continue
+        rows.append({
+            "_id": PydanticObjectId(),
+            "user_id": "bench",
+            "date": datetime.combine(start + timedelta(days=offset), datetime.min.time()),
+            "health_metrics": {
+                "weight": 80 - offset * 0.01 if rng.random() < 0.5 else None,
+                "energy_level": rng.randint(1, 10) if rng.random() < 0.3 else None,
+                "mood": rng.randint(1, 10) if rng.random() < 0.3 else None
+            },
+            "nutrition_metrics": {
+                "calories_consumed": rng.uniform(1500, 3000),
+                "protein_consumed": rng.uniform(60, 180),
+                "water_consumed": rng.uniform(0, 3000),
+                "meals_logged": rng.randint(0, 5)
+            },
+            "activity_metrics": {"gym_sessions": rng.randint(0, 1)},
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        })
+    return rows
+
+def _summary(rows: list, user: User, start: date, end: date) -> None:
+    frame = DailyStatsFrame.from_rows(rows)
+    weekly_trends(frame, end)
+    achievements(frame, user)
+    recommendations(frame, user)
+    consistency_metrics(frame, start, end)
+
+def main():
+    user = User.model_construct(profile=UserProfile(weight=80))
+    end = date.today()
+
+    print(f"Iteraciones: {ITERATIONS}")
+    print(f"{'Período':<12}{'filas':>7}{'frame + cálculos':>20}{'solo Pydantic':>17}")
+    for days in PERIODS:
+        rows = _rows(days)
+        start = end - timedelta(days=days - 1)
+        engine_ms = timeit.timeit(lambda: _summary(rows, user, start, end), number=ITERATIONS) / ITERATIONS * 1e3
+        pydantic_ms = timeit.timeit(
+            lambda: [DailyStatsView.model_validate(row) for row in rows], number=ITERATIONS
+        ) / ITERATIONS * 1e3
+        print(f"{f'{days} días':<12}{len(rows):>7}{engine_ms:17.2f} ms{pydantic_ms:14.2f} ms")
+
+    # Tendencias: reconstruir el estado completo vs agregar un día al estado existente
+    frame = DailyStatsFrame.from_rows(_rows(180))
+    rebuild_ms = timeit.timeit(lambda: TrendState.from_frame(frame), number=ITERATIONS) / ITERATIONS * 1e3
+    state = TrendState.from_frame(frame)
+    day_values = [frame[name][-1] for name in TREND_METRICS]
+    next_day = date.today() + timedelta(days=1)
+    add_day_us = timeit.timeit(lambda: state.add_day(next_day, day_values), number=ITERATIONS) / ITERATIONS * 1e6
+    snapshot_us = timeit.timeit(lambda: state.snapshot(next_day), number=ITERATIONS) / ITERATIONS * 1e6
+    print()
+    print(f"TrendState desde 180 días: {rebuild_ms:.2f} ms")
+    print(f"TrendState.add_day:        {add_day_us:.1f} µs")
+    print(f"TrendState.snapshot:       {snapshot_us:.1f} µs")
+
+if __name__ == "__main__":
+    main()
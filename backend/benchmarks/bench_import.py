@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark de importación histórica contra un mongod local
+
+Compara la inserción fila a fila (lo que hace POST /nutrition/food: insert +
+rollup por entrada) con la importación por bloques (bulk_write sin orden y una
+reconstrucción de rollups al final) para distintos tamaños de bloque.
+
+Usa la base configurada en MONGODB_URL / DATABASE_NAME con un usuario ficticio
+y elimina sus datos al terminar. No lo ejecutes contra una base de producción.
+
+Imprime una tabla en Markdown lista para registrar en la sección de
+benchmarks del README, marcando el IMPORT_CHUNK_SIZE configurado, y el tamaño
+de bloque sugerido: el menor cuyo throughput queda a menos de un 5 % del mejor
+(bloques más chicos usan menos memoria y reportan los errores antes). Cada
+tamaño se mide --repeat veces y se usa la mejor.
+
+Uso (desde backend/):
+    python benchmarks/bench_import.py [--rows 20000] [--row-by-row 1000] [--repeat 3]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import orjson
+from beanie import PydanticObjectId
+
+from config import settings
+from database import init_db
+from models.export import ExportFormat
+from models.nutrition import FoodEntry, WaterEntry, DailyNutritionRollup, MealType, FoodCategory
+from models.analytics import DailyStats
+from services.importer import import_history
+from services.nutrition_rollup import record_food_entries
+
+CHUNK_SIZES = sorted({100, 500, 1000, 5000, settings.import_chunk_size})
+
+# Fracción del mejor throughput dentro de la cual se prefiere el bloque más chico
+SUGGESTION_TOLERANCE = 0.95
+
+def _food_record(i: int) -> dict:
+    meal_types = list(MealType)
+    return {
+        "type": "food",
+        "food_name": f"Alimento {i}",
+        "quantity": 100,
+        "meal_type": meal_types[i % len(meal_types)].value,
+        "category": FoodCategory.PROTEIN.value,
+        "nutrition": {"calories": 250, "protein": 20, "carbs": 30, "fats": 8},
+        # Unas 6 entradas por día hacia atrás desde hoy
+        "date": (datetime.now() - timedelta(hours=4 * i)).isoformat()
+    }
+
+async def _lines(rows: int):
+    for i in range(rows):
+        yield orjson.dumps(_food_record(i)).decode()
+
+async def _cleanup(user_id: str) -> None:
+    for model in (FoodEntry, WaterEntry, DailyNutritionRollup, DailyStats):
+        await model.get_motor_collection().delete_many({"user_id": user_id})
+
+async def _row_by_row(user_id: str, rows: int) -> float:
+    started = time.perf_counter()
+    for i in range(rows):
+        record = _food_record(i)
+        record.pop("type")
+        entry = FoodEntry(user_id=user_id, **record)
+        await entry.insert()
+        await record_food_entries(user_id, [entry])
+    return time.perf_counter() - started
+
+async def _import(user_id: str, rows: int, chunk_size: int) -> float:
+    started = time.perf_counter()
+    summary = await import_history(user_id, _lines(rows), ExportFormat.NDJSON, chunk_size=chunk_size)
+    elapsed = time.perf_counter() - started
+    await _cleanup(user_id)
+    if summary.inserted["food"] != rows:
+        raise SystemExit(f"❌ Se escribieron {summary.inserted['food']} de {rows} filas con bloques de {chunk_size}")
+    return rows / elapsed
+
+async def main(rows: int, row_by_row_rows: int, repeat: int) -> None:
+    await init_db()
+    user_id = str(PydanticObjectId())
+
+    try:
+        print(f"Filas por importación: {rows}, MongoDB: {settings.mongodb_url}")
+        print()
+        print("| Modo                         |   Filas/s | Filas  |")
+        print("|------------------------------|----------:|-------:|")
+
+        elapsed = await _row_by_row(user_id, row_by_row_rows)
+        print(f"| {'fila a fila (POST /food)':<28} | {row_by_row_rows / elapsed:9.0f} | {row_by_row_rows:>6} |")
+        await _cleanup(user_id)
+
+        throughput = {}
+        for chunk_size in CHUNK_SIZES:
+            throughput[chunk_size] = max([await _import(user_id, rows, chunk_size) for _ in range(repeat)])
+            label = f"bloques de {chunk_size}"
+            if chunk_size == settings.import_chunk_size:
+                label += " (actual)"
+            print(f"| {label:<28} | {throughput[chunk_size]:9.0f} | {rows:>6} |")
+
+        best = max(throughput.values())
+        suggested = min(size for size, value in throughput.items() if value >= best * SUGGESTION_TOLERANCE)
+        print()
+        print(f"IMPORT_CHUNK_SIZE sugerido: {suggested} (actual: {settings.import_chunk_size})")
+    finally:
+        await _cleanup(user_id)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de importación histórica")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--row-by-row", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.row_by_row, args.repeat))
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de serialización de respuestas por endpoint:
+ruta estándar de FastAPI vs ruta rápida (model_construct + orjson)
+
+La ruta estándar reproduce lo que hacía cada handler: construir el modelo de
+respuesta validando, volver a validarlo contra `response_model` y serializarlo
+con el encoder json de la librería estándar. No usa MongoDB: los documentos
+se generan en memoria.
+
+Uso (desde backend/):
+    python benchmarks/bench_serialization.py
+"""
+
+import sys
+import timeit
+from datetime import datetime, date, timedelta
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from beanie import PydanticObjectId
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from models.analytics import (
+    DailyStatsResponse, DailyStatsView, HealthMetric,
+    AnalyticsSummary, WeeklyTrend, MonthlyProgress, TrendDirection
+)
+from models.nutrition import (
+    FoodEntryResponse, FoodEntryView, WaterEntryResponse, WaterEntryView,
+    DailyNutritionSummary, NutritionInfo, MealType, FoodCategory
+)
+from services.fast_json import ORJSONModelResponse
+
+ITERATIONS = 500
+
+def _food_views(count: int) -> List[FoodEntryView]:
+    now = datetime.now()
+    meal_types = list(MealType)
+    return [
+        FoodEntryView(
+            _id=PydanticObjectId(),
+            food_name=f"Alimento {i}",
+            quantity=100 + i,
+            unit="gramos",
+            meal_type=meal_types[i % len(meal_types)],
+            category=FoodCategory.PROTEIN,
+            nutrition=NutritionInfo(calories=250, protein=20, carbs=30, fats=8, fiber=3),
+            notes="Registro de prueba",
+            date=now - timedelta(minutes=i),
+            created_at=now
+        ) for i in range(count)
+    ]
+
+def _water_views(count: int) -> List[WaterEntryView]:
+    now = datetime.now()
+    return [
+        WaterEntryView(_id=PydanticObjectId(), amount=250, date=now - timedelta(minutes=i), created_at=now)
+        for i in range(count)
+    ]
+
+def _stats_views(count: int) -> List[DailyStatsView]:
+    now = datetime.now()
+    return [
+        DailyStatsView(
+            _id=PydanticObjectId(),
+            date=date.today() - timedelta(days=i),
+            health_metrics=HealthMetric(weight=80 - i * 0.1, sleep_hours=7.5, mood=7),
+            notes="Día de prueba",
+            created_at=now,
+            updated_at=now
+        ) for i in range(count)
+    ]
+
+def _analytics_summary() -> AnalyticsSummary:
+    """Resumen de un año: tendencias de todas las métricas y 12 meses de progreso"""
+    today = date.today()
+    return AnalyticsSummary(
+        user_id=str(PydanticObjectId()),
+        period_start=today - timedelta(days=365),
+        period_end=today,
+        weekly_trends=[
+            WeeklyTrend(
+                metric_name=f"metric_{i}", current_value=80 + i, previous_value=79 + i,
+                change_percentage=1.2, direction=TrendDirection.UP
+            ) for i in range(24)
+        ],
+        monthly_progress=[
+            MonthlyProgress(
+                month=f"{today.year}-{month:02d}", weight_change=-0.8, avg_calories=2150.5,
+                avg_protein=132.4, gym_sessions=12, consistency_score=87.1
+            ) for month in range(1, 13)
+        ],
+        achievements=["¡7 días consecutivos registrando datos!", "¡Un mes completo de seguimiento!"],
+        recommendations=["Intenta beber más agua diariamente. Tu promedio está por debajo del recomendado."],
+        consistency_metrics={
+            "overall_consistency": 87.1, "meal_logging_consistency": 80.2,
+            "water_logging_consistency": 75.4, "health_metrics_consistency": 52.3,
+            "total_days_in_period": 366, "days_with_data": 319
+        }
+    )
+
+def _standard(model_type, content) -> bytes:
+    """Validación en el handler, revalidación de response_model y json estándar"""
+    adapter = TypeAdapter(model_type)
+    validated = adapter.validate_python(adapter.dump_python(content))
+    return JSONResponse(adapter.dump_python(validated, mode="json")).body
+
+def _validated(model_cls, constructed):
+    return model_cls(**dict(constructed))
+
+def _summary(food, water, build):
+    meals_by_type = {}
+    for entry in food:
+        meals_by_type.setdefault(entry.meal_type.value, []).append(build(FoodEntryResponse, entry.to_response()))
+    return dict(
+        date=datetime.combine(date.today(), datetime.min.time()),
+        total_calories=2400, total_protein=150, total_carbs=280, total_fats=70,
+        total_fiber=30, total_water=2000,
+        meals_by_type=meals_by_type,
+        water_entries=[build(WaterEntryResponse, entry.to_response()) for entry in water]
+    )
+
+def main():
+    food = _food_views(100)
+    water = _water_views(100)
+    stats = _stats_views(90)
+    day_food, day_water = food[:12], water[:8]
+    summary = _analytics_summary()
+
+    cases = {
+        "GET /nutrition/food (100)": (
+            lambda: _standard(List[FoodEntryResponse], [_validated(FoodEntryResponse, e.to_response()) for e in food]),
+            lambda: ORJSONModelResponse([e.to_response() for e in food]).body
+        ),
+        "GET /nutrition/water (100)": (
+            lambda: _standard(List[WaterEntryResponse], [_validated(WaterEntryResponse, e.to_response()) for e in water]),
+            lambda: ORJSONModelResponse([e.to_response() for e in water]).body
+        ),
+        "GET /nutrition/daily-summary": (
+            lambda: _standard(DailyNutritionSummary, DailyNutritionSummary(**_summary(day_food, day_water, _validated))),
+            lambda: ORJSONModelResponse(DailyNutritionSummary.model_construct(
+                **_summary(day_food, day_water, lambda cls, constructed: constructed)
+            )).body
+        ),
+        "GET /analytics/daily-stats (90)": (
+            lambda: _standard(List[DailyStatsResponse], [_validated(DailyStatsResponse, s.to_response()) for s in stats]),
+            lambda: ORJSONModelResponse([s.to_response() for s in stats]).body
+        ),
+        # El handler construye el resumen validado en ambas rutas; cambia solo la salida
+        "GET /analytics/summary (365 días)": (
+            lambda: _standard(AnalyticsSummary, summary),
+            lambda: ORJSONModelResponse(summary).body
+        ),
+    }
+
+    print(f"Iteraciones: {ITERATIONS}")
+    print(f"{'Endpoint':<34}{'estándar':>12}{'rápida':>12}{'mejora':>9}")
+    for name, (standard, fast) in cases.items():
+        standard_us = timeit.timeit(standard, number=ITERATIONS) / ITERATIONS * 1e6
+        fast_us = timeit.timeit(fast, number=ITERATIONS) / ITERATIONS * 1e6
+        print(f"{name:<34}{standard_us:9.1f} µs{fast_us:9.1f} µs{standard_us / fast_us:8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de verificación de JWT: python-jose vs caché de tokens verificados
+
+Uso (desde backend/):
+    python benchmarks/bench_token_cache.py
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jose import jwt
+
+from config import settings
+from routers.auth import create_access_token
+from services.token_cache import decode_access_token, token_cache
+
+ITERATIONS = 20000
+
+def main():
+    token = create_access_token(data={"sub": "benchmark@rehabilife.local"})
+    
+    jose_time = timeit.timeit(
+        lambda: jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm]),
+        number=ITERATIONS
+    )
+    
+    token_cache.clear()
+    decode_access_token(token)  # Primer uso: verificación completa
+    cached_time = timeit.timeit(lambda: decode_access_token(token), number=ITERATIONS)
+    
+    jose_us = jose_time / ITERATIONS * 1e6
+    cached_us = cached_time / ITERATIONS * 1e6
+    
+    print(f"Iteraciones: {ITERATIONS}")
+    print(f"jwt.decode (python-jose): {jose_us:8.2f} µs/petición")
+    print(f"Caché de tokens (acierto): {cached_us:8.2f} µs/petición")
+    print(f"Ahorro por petición:       {jose_us - cached_us:8.2f} µs ({jose_us / cached_us:.1f}x)")
+    print(f"Estadísticas de caché: {token_cache.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,44 @@ class Settings(BaseSettings):
     secret_key: str = "your-super-secret-jwt-key-change-this-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    refresh_token_expire_days: int = 30
+    
+    # Configuración de cachés de autenticación
+    user_cache_max_size: int = 1024
+    user_cache_ttl_seconds: int = 60
+    token_cache_max_size: int = 4096
+    
+    # Configuración de caché de consejos nutricionales
+    advice_cache_max_size: int = 2048
+    
+    # Caché de /analytics/summary y /analytics/goals-progress (expira al cambiar el día).
+    # Es por proceso: cada lectura la valida contra los MonthlyStats, así que con
+    # varios workers una escritura en otro proceso también la descarta
+    analytics_cache_max_size: int = 2048
+    
+    # Tendencias: días de historial para medias móviles/EWMA, usuarios con estado en memoria
+    # y segundos que dura cada estado (es por worker: acota el retraso entre procesos)
+    trend_history_days: int = 180
+    trend_state_cache_max_size: int = 1024
+    trend_state_ttl_seconds: int = 300
+    
+    # Configuración de hashing de contraseñas
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 4
+    password_hash_queue_limit: int = 32
+    
+    # Serialización rápida (orjson, sin revalidar response_model) en listados y resúmenes
+    fast_json_responses: bool = False
+    
+    # Días máximos por consulta de /nutrition/range-summary
+    range_summary_max_days: int = 366
+    
+    # Configuración de escrituras en lote
+    food_batch_max_items: int = 50
+    import_chunk_size: int = 1000
+    sync_max_operations: int = 200
+    # Segundos tras los que un recibo de sincronización pendiente se considera abandonado
+    sync_claim_timeout_seconds: int = 300
     
     # Configuración del servidor
     host: str = "0.0.0.0"
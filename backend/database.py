@@ -3,9 +3,11 @@ from motor.motor_asyncio import AsyncIOMotorClient
 
 from config import settings, logger
 from models.user import User
-from models.nutrition import FoodEntry, WaterEntry
-from models.analytics import DailyStats
+from models.nutrition import FoodEntry, WaterEntry, DailyNutritionRollup
+from models.analytics import DailyStats, WeeklyStats, MonthlyStats
 from models.notification import NotificationSettings, NotificationLog
+from models.session import RefreshSession
+from models.sync import SyncReceipt
 
 async def init_db():
     """Inicializar conexión a MongoDB y Beanie"""
@@ -25,10 +27,17 @@ async def init_db():
                 User,
                 FoodEntry,
                 WaterEntry,
+                DailyNutritionRollup,
                 DailyStats,
+                WeeklyStats,
+                MonthlyStats,
                 NotificationSettings,
-                NotificationLog
-            ]
+                NotificationLog,
+                RefreshSession,
+                SyncReceipt
+            ],
+            # Permite reemplazar índices obsoletos por los declarados en los modelos
+            allow_index_dropping=True
         )
         
         logger.info(f"Beanie inicializado con base de datos: {settings.database_name}")
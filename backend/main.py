@@ -4,7 +4,9 @@ from contextlib import asynccontextmanager
 
 from config import settings, logger
 from database import init_db
-from routers import auth, users, nutrition, analytics, notifications
+from routers import auth, users, nutrition, analytics, notifications, sync, export, imports
+from services.cache import get_cache_stats
+from services.password_hasher import password_hasher
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -15,6 +17,7 @@ async def lifespan(app: FastAPI):
     yield
     # Cleanup al cerrar (si es necesario)
     logger.info("Cerrando RehabiLife API...")
+    password_hasher.shutdown()
 
 app = FastAPI(
     title="RehabiLife API",
@@ -31,6 +34,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Incluir routers
@@ -39,6 +43,9 @@ app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(nutrition.router, prefix="/api/nutrition", tags=["nutrition"])
 app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
 app.include_router(notifications.router, prefix="/api/notifications", tags=["notifications"])
+app.include_router(sync.router, prefix="/api/sync", tags=["sync"])
+app.include_router(export.router, prefix="/api/export", tags=["export"])
+app.include_router(imports.router, prefix="/api/import", tags=["import"])
 
 @app.get("/")
 async def root():
@@ -48,6 +55,11 @@ async def root():
 async def health_check():
     return {"status": "healthy", "message": "API funcionando correctamente"}
 
+@app.get("/health/caches")
+async def cache_stats():
+    """Contadores de aciertos/fallos de las cachés en memoria"""
+    return get_cache_stats()
+
 if __name__ == "__main__":
     import uvicorn
     logger.info(f"Iniciando servidor en {settings.host}:{settings.port}")
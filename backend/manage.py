@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Comandos de mantenimiento para RehabiLife Backend
+
+Uso:
+    python manage.py indexes            # Construir índices y verificar planes de consulta
+    python manage.py indexes --no-explain
+    python manage.py rebuild-rollups    # Reconstruir rollups nutricionales diarios
+    python manage.py rebuild-rollups --user-email paciente@example.com --start 2024-01-01
+    python manage.py backfill-day-keys  # Calcular day_key en documentos antiguos y reconstruir rollups
+    python manage.py dedupe-daily-stats  # Fusionar DailyStats duplicadas (antes de desplegar el índice único)
+    python manage.py rebuild-period-stats  # Reconstruir agregados semanales y mensuales de DailyStats
+    python manage.py import --user-email paciente@example.com historial.ndjson.gz
+    python manage.py import --user-email paciente@example.com comidas.csv --dataset food
+"""
+
+import argparse
+import asyncio
+import sys
+from datetime import date
+
+from database import init_db
+
+async def command_indexes(args) -> int:
+    """Construir los índices declarados en los modelos y verificar los planes"""
+    from services.index_audit import audit_query_plans
+    
+    print("🔧 Construyendo índices declarados en los modelos...")
+    await init_db()
+    print("✅ Índices construidos")
+    
+    if args.no_explain:
+        return 0
+    
+    print("\n🔍 Verificando planes de consulta con explain()...")
+    results = await audit_query_plans()
+    
+    for result in results:
+        icon = "✅" if result["ok"] else "❌"
+        print(f"{icon} [{result['collection']}] {result['name']}: {', '.join(result['stages'])}")
+        for problem in result["problems"]:
+            print(f"     ↳ {problem}")
+    
+    failed = [r for r in results if not r["ok"]]
+    if failed:
+        print(f"\n❌ {len(failed)} consultas sin un plan adecuado")
+        return 1
+    
+    print("\n✅ Todas las consultas usan índices sin ordenamiento en memoria")
+    return 0
+
+async def _resolve_user_id(email):
+    """Obtener el id de usuario a partir de su email (None si no se indicó)"""
+    from models.user import User
+    
+    if not email:
+        return None
+    user = await User.find_one(User.email == email)
+    if not user:
+        raise SystemExit(f"❌ Usuario no encontrado: {email}")
+    return str(user.id)
+
+async def command_rebuild_rollups(args) -> int:
+    """Reconstruir los rollups nutricionales diarios desde las entradas crudas"""
+    from services.nutrition_rollup import rebuild_rollups
+    
+    await init_db()
+    user_id = await _resolve_user_id(args.user_email)
+    
+    print("🔧 Reconstruyendo rollups nutricionales...")
+    written = await rebuild_rollups(user_id=user_id, start=args.start, end=args.end)
+    print(f"✅ {written} rollups reconstruidos")
+    return 0
+
+async def command_backfill_day_keys(args) -> int:
+    """Calcular day_key en la zona horaria de cada usuario y reconstruir sus rollups"""
+    from services.day_keys import backfill_day_keys
+    from services.nutrition_rollup import rebuild_rollups
+    
+    await init_db()
+    user_id = await _resolve_user_id(args.user_email)
+    
+    print("🔧 Calculando day_key en documentos existentes...")
+    updated = await backfill_day_keys(user_id=user_id)
+    for collection, count in updated.items():
+        print(f"✅ {collection}: {count} documentos actualizados")
+    
+    # Los días pueden cambiar al pasar a la zona horaria del usuario
+    print("🔧 Reconstruyendo rollups nutricionales...")
+    written = await rebuild_rollups(user_id=user_id)
+    print(f"✅ {written} rollups reconstruidos")
+    return 0
+
+async def command_dedupe_daily_stats(args) -> int:
+    """Fusionar las DailyStats duplicadas por usuario y día"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from config import settings
+    from models.analytics import DailyStats
+    from models.user import User
+    from services.stats_writer import dedupe_daily_stats
+    
+    # Sin init_db: Beanie intentaría crear user_date_unique y fallaría con duplicados
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    database = client[settings.database_name]
+    collection = database[DailyStats.Settings.name]
+    user_id = None
+    if args.user_email:
+        user = await database[User.Settings.name].find_one({"email": args.user_email}, {"_id": 1})
+        if not user:
+            raise SystemExit(f"❌ Usuario no encontrado: {args.user_email}")
+        user_id = str(user["_id"])
+    
+    print("🔧 Fusionando estadísticas diarias duplicadas...")
+    result = await dedupe_daily_stats(collection, user_id=user_id)
+    print(f"✅ {result['merged']} días fusionados, {result['removed']} documentos eliminados")
+    if result["merged"]:
+        print("ℹ️  Ejecuta rebuild-period-stats para recalcular los agregados de esos días")
+    client.close()
+    return 0
+
+async def command_rebuild_period_stats(args) -> int:
+    """Reconstruir WeeklyStats y MonthlyStats desde las estadísticas diarias"""
+    from services.period_stats import rebuild_period_stats
+    
+    await init_db()
+    user_id = await _resolve_user_id(args.user_email)
+    
+    print("🔧 Reconstruyendo agregados semanales y mensuales...")
+    written = await rebuild_period_stats(user_id=user_id)
+    for collection, count in written.items():
+        print(f"✅ {collection}: {count} documentos escritos")
+    return 0
+
+async def _read_file(path: str):
+    """Leer un archivo por bloques para no cargarlo completo en memoria"""
+    with open(path, "rb") as file:
+        while chunk := file.read(64 * 1024):
+            yield chunk
+
+async def command_import(args) -> int:
+    """Importar historial de un usuario desde un archivo NDJSON o CSV"""
+    from models.export import ExportDataset, ExportFormat
+    from services.importer import import_history, iter_lines
+    
+    compressed = args.file.endswith(".gz")
+    name = args.file[:-3] if compressed else args.file
+    import_format = ExportFormat(args.format or ("csv" if name.endswith(".csv") else "ndjson"))
+    dataset = ExportDataset(args.dataset) if args.dataset else None
+    if import_format == ExportFormat.CSV and dataset is None:
+        print("❌ La importación CSV requiere --dataset")
+        return 1
+    
+    await init_db()
+    user_id = await _resolve_user_id(args.user_email)
+    
+    print(f"📥 Importando {args.file} ({import_format.value}) para {args.user_email}...")
+    summary = await import_history(
+        user_id,
+        iter_lines(_read_file(args.file), compressed=compressed),
+        import_format,
+        dataset,
+        chunk_size=args.chunk_size
+    )
+    
+    for dataset_name, count in summary.inserted.items():
+        print(f"✅ {dataset_name}: {count} registros escritos")
+    print(f"🔧 {summary.rollups_rebuilt} rollups nutricionales reconstruidos")
+    if summary.failed_count:
+        print(f"⚠️  {summary.failed_count} registros con errores")
+        for error in summary.errors:
+            print(f"     ↳ línea {error.line}: {error.error}")
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Comandos de mantenimiento de RehabiLife")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    indexes_parser = subparsers.add_parser("indexes", help="Construir índices y verificar planes de consulta")
+    indexes_parser.add_argument("--no-explain", action="store_true", help="Solo construir índices")
+    indexes_parser.set_defaults(handler=command_indexes)
+    
+    rollups_parser = subparsers.add_parser("rebuild-rollups", help="Reconstruir rollups nutricionales diarios")
+    rollups_parser.add_argument("--user-email", help="Solo este usuario")
+    rollups_parser.add_argument("--start", type=date.fromisoformat, help="Fecha inicial (YYYY-MM-DD)")
+    rollups_parser.add_argument("--end", type=date.fromisoformat, help="Fecha final (YYYY-MM-DD)")
+    rollups_parser.set_defaults(handler=command_rebuild_rollups)
+    
+    day_keys_parser = subparsers.add_parser("backfill-day-keys", help="Calcular day_key en documentos antiguos")
+    day_keys_parser.add_argument("--user-email", help="Solo este usuario")
+    day_keys_parser.set_defaults(handler=command_backfill_day_keys)
+    
+    dedupe_parser = subparsers.add_parser(
+        "dedupe-daily-stats", help="Fusionar DailyStats duplicadas por usuario y día"
+    )
+    dedupe_parser.add_argument("--user-email", help="Solo este usuario")
+    dedupe_parser.set_defaults(handler=command_dedupe_daily_stats)
+    
+    period_parser = subparsers.add_parser(
+        "rebuild-period-stats", help="Reconstruir agregados semanales y mensuales de DailyStats"
+    )
+    period_parser.add_argument("--user-email", help="Solo este usuario")
+    period_parser.set_defaults(handler=command_rebuild_period_stats)
+    
+    import_parser = subparsers.add_parser("import", help="Importar historial desde NDJSON o CSV")
+    import_parser.add_argument("file", help="Archivo .ndjson o .csv (opcionalmente .gz)")
+    import_parser.add_argument("--user-email", required=True, help="Usuario que recibe el historial")
+    import_parser.add_argument("--format", choices=["ndjson", "csv"], help="Por defecto según la extensión")
+    import_parser.add_argument("--dataset", choices=["food", "water", "daily_stats"], help="Conjunto del CSV")
+    import_parser.add_argument("--chunk-size", type=int, help="Documentos por bulk_write (IMPORT_CHUNK_SIZE)")
+    import_parser.set_defaults(handler=command_import)
+    
+    return parser
+
+def main() -> int:
+    args = build_parser().parse_args()
+    return asyncio.run(args.handler(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
-from beanie import Document
+from beanie import Document, PydanticObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 from datetime import datetime
@@ -53,9 +54,52 @@ class DailyStats(Document):
     class Settings:
         name = "daily_stats"
         indexes = [
-            "user_id",
-            "date",
-            "created_at"
+            IndexModel(
+                [("user_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)],
+                name="user_date_id",
+                background=True
+            ),
+            # Un documento por usuario y día: los upserts concurrentes no lo duplican
+            IndexModel([("user_id", ASCENDING), ("date", DESCENDING)], unique=True, name="user_date_unique")
+        ]
+
+class PeriodStats(Document):
+    """Agregados de DailyStats de un período (semana o mes calendario) por usuario
+
+    Se recalculan desde los días del período en cada escritura de DailyStats
+    (ver services/period_stats.py). Las claves de sums/counts/mins/maxs son los
+    campos de HealthMetric, NutritionMetrics y ActivityMetrics. `version` aumenta
+    con cada recálculo y protege las escrituras concurrentes.
+    """
+    user_id: str
+    period_start: Date
+    period_end: Date
+    days_in_period: int
+    days_logged: int = 0
+    sums: Dict[str, float] = Field(default_factory=dict)
+    counts: Dict[str, int] = Field(default_factory=dict)
+    mins: Dict[str, float] = Field(default_factory=dict)
+    maxs: Dict[str, float] = Field(default_factory=dict)
+    first_weight: Optional[float] = None
+    last_weight: Optional[float] = None
+    weight_days: int = 0
+    version: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class WeeklyStats(PeriodStats):
+    """Agregados por semana ISO (de lunes a domingo)"""
+    class Settings:
+        name = "weekly_stats"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("period_start", ASCENDING)], unique=True, name="user_period_unique")
+        ]
+
+class MonthlyStats(PeriodStats):
+    """Agregados por mes calendario"""
+    class Settings:
+        name = "monthly_stats"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("period_start", ASCENDING)], unique=True, name="user_period_unique")
         ]
 
 # Schemas para analytics
@@ -66,6 +110,23 @@ class WeeklyTrend(BaseModel):
     change_percentage: float
     direction: TrendDirection
 
+class MetricTrend(BaseModel):
+    metric_name: str
+    section: str  # health_metrics, nutrition_metrics o activity_metrics
+    moving_average_7: Optional[float] = None
+    moving_average_14: Optional[float] = None
+    moving_average_30: Optional[float] = None
+    ewma: Optional[float] = None
+    week_over_week_change: Optional[float] = None
+    week_over_week_percentage: Optional[float] = None
+    direction: Optional[TrendDirection] = None
+    days_with_data: int = 0  # en los últimos 30 días
+
+class TrendReport(BaseModel):
+    user_id: str
+    as_of: Date
+    metrics: List[MetricTrend]
+
 class MonthlyProgress(BaseModel):
     month: str
     weight_change: Optional[float] = None
@@ -114,6 +175,64 @@ class DailyStatsResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+def daily_stats_response(stats) -> DailyStatsResponse:
+    """Construir la respuesta desde un DailyStats ya validado, sin volver a validarlo"""
+    return DailyStatsResponse.model_construct(
+        id=str(stats.id),
+        date=stats.date,
+        health_metrics=stats.health_metrics,
+        nutrition_metrics=stats.nutrition_metrics,
+        activity_metrics=stats.activity_metrics,
+        notes=stats.notes,
+        created_at=stats.created_at,
+        updated_at=stats.updated_at
+    )
+
+class PeriodStatsResponse(BaseModel):
+    period_start: Date
+    period_end: Date
+    days_in_period: int
+    days_logged: int
+    sums: Dict[str, float]
+    counts: Dict[str, int]
+    averages: Dict[str, float]
+    mins: Dict[str, float]
+    maxs: Dict[str, float]
+    first_weight: Optional[float] = None
+    last_weight: Optional[float] = None
+    weight_days: int = 0
+
+def period_stats_response(stats: PeriodStats) -> PeriodStatsResponse:
+    """Construir la respuesta de un WeeklyStats/MonthlyStats, con promedios por métrica"""
+    return PeriodStatsResponse.model_construct(
+        period_start=stats.period_start,
+        period_end=stats.period_end,
+        days_in_period=stats.days_in_period,
+        days_logged=stats.days_logged,
+        sums=stats.sums,
+        counts=stats.counts,
+        averages={metric: stats.sums[metric] / count for metric, count in stats.counts.items() if count},
+        mins=stats.mins,
+        maxs=stats.maxs,
+        first_weight=stats.first_weight,
+        last_weight=stats.last_weight,
+        weight_days=stats.weight_days
+    )
+
+class DailyStatsView(BaseModel):
+    """Proyección de DailyStats para listados"""
+    id: PydanticObjectId = Field(alias="_id")
+    date: Date
+    health_metrics: HealthMetric = Field(default_factory=HealthMetric)
+    nutrition_metrics: NutritionMetrics = Field(default_factory=NutritionMetrics)
+    activity_metrics: ActivityMetrics = Field(default_factory=ActivityMetrics)
+    notes: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    
+    def to_response(self) -> DailyStatsResponse:
+        return daily_stats_response(self)
+
 class AnalyticsRequest(BaseModel):
     start_date: Optional[Date] = None
     end_date: Optional[Date] = None
@@ -0,0 +1,27 @@
+from enum import Enum
+from typing import Dict, List
+
+from pydantic import BaseModel
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class ExportDataset(str, Enum):
+    FOOD = "food"
+    WATER = "water"
+    DAILY_STATS = "daily_stats"
+    NOTIFICATIONS = "notifications"
+
+# Conjuntos que se pueden importar (las notificaciones se generan en el servidor)
+IMPORTABLE_DATASETS = (ExportDataset.FOOD, ExportDataset.WATER, ExportDataset.DAILY_STATS)
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportSummary(BaseModel):
+    inserted: Dict[str, int]
+    failed_count: int
+    errors: List[ImportRowError]
+    rollups_rebuilt: int
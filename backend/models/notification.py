@@ -1,4 +1,5 @@
 from beanie import Document
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 from datetime import datetime
@@ -83,7 +84,9 @@ class NotificationSettings(Document):
     
     class Settings:
         name = "notification_settings"
-        indexes = ["user_id"]
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], unique=True, name="user_id_unique")
+        ]
 
 class NotificationLog(Document):
     user_id: str = Field(..., index=True)
@@ -91,6 +94,8 @@ class NotificationLog(Document):
     title: str
     message: str
     sent_at: datetime = Field(default_factory=datetime.utcnow)
+    # Día (YYYY-MM-DD) en la zona horaria del usuario, calculado al escribir
+    day_key: Optional[str] = None
     read_at: Optional[datetime] = None
     is_read: bool = False
     metadata: Optional[Dict] = None
@@ -98,10 +103,21 @@ class NotificationLog(Document):
     class Settings:
         name = "notification_logs"
         indexes = [
-            "user_id",
-            "sent_at",
-            "notification_type",
-            "is_read"
+            IndexModel(
+                [("user_id", ASCENDING), ("day_key", ASCENDING)],
+                name="user_day_key",
+                background=True
+            ),
+            IndexModel(
+                [("user_id", ASCENDING), ("sent_at", DESCENDING), ("_id", DESCENDING)],
+                name="user_sent_at_id",
+                background=True
+            ),
+            IndexModel(
+                [("user_id", ASCENDING), ("notification_type", ASCENDING), ("sent_at", DESCENDING), ("_id", DESCENDING)],
+                name="user_type_sent_at_id",
+                background=True
+            )
         ]
 
 # Schemas para requests/responses
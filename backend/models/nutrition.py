@@ -1,7 +1,9 @@
-from beanie import Document
+from beanie import Document, PydanticObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 from datetime import datetime
+from datetime import date as Date
 from enum import Enum
 
 class MealType(str, Enum):
@@ -44,28 +46,71 @@ class FoodEntry(Document):
     nutrition: NutritionInfo = Field(default_factory=NutritionInfo)
     notes: Optional[str] = None
     date: datetime = Field(default_factory=datetime.now, index=True)
+    # Día (YYYY-MM-DD) en la zona horaria del usuario, calculado al escribir
+    day_key: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.now)
     
     class Settings:
         name = "food_entries"
         indexes = [
-            "user_id",
-            "date",
-            "meal_type",
-            "category"
+            IndexModel(
+                [("user_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)],
+                name="user_date_id",
+                background=True
+            ),
+            IndexModel(
+                [("user_id", ASCENDING), ("day_key", ASCENDING), ("date", ASCENDING)],
+                name="user_day_key_date",
+                background=True
+            )
         ]
 
 class WaterEntry(Document):
     user_id: str = Field(..., index=True)
     amount: float  # en ml
     date: datetime = Field(default_factory=datetime.now, index=True)
+    # Día (YYYY-MM-DD) en la zona horaria del usuario, calculado al escribir
+    day_key: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.now)
     
     class Settings:
         name = "water_entries"
         indexes = [
-            "user_id",
-            "date"
+            IndexModel(
+                [("user_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)],
+                name="user_date_id",
+                background=True
+            ),
+            IndexModel(
+                [("user_id", ASCENDING), ("day_key", ASCENDING), ("date", ASCENDING)],
+                name="user_day_key_date",
+                background=True
+            )
+        ]
+
+class DailyNutritionRollup(Document):
+    """Totales nutricionales por usuario y día, mantenidos con $inc en cada escritura"""
+    user_id: str
+    date: Date
+    calories: float = 0
+    protein: float = 0
+    carbs: float = 0
+    fats: float = 0
+    fiber: float = 0
+    water: float = 0
+    meals_logged: int = 0
+    water_entries: int = 0
+    alcohol_units: float = 0
+    alcohol_entries: int = 0
+    processed_entries: int = 0
+    breakfast_entries: int = 0
+    breakfast_protein: float = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "daily_nutrition_rollups"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("date", DESCENDING)], unique=True, name="user_date_unique")
         ]
 
 # Schemas para requests/responses
@@ -90,6 +135,51 @@ class FoodEntryResponse(BaseModel):
     date: datetime
     created_at: datetime
 
+def food_entry_response(entry) -> FoodEntryResponse:
+    """Construir la respuesta desde un FoodEntry ya validado, sin volver a validarlo"""
+    return FoodEntryResponse.model_construct(
+        id=str(entry.id),
+        food_name=entry.food_name,
+        quantity=entry.quantity,
+        unit=entry.unit,
+        meal_type=entry.meal_type,
+        category=entry.category,
+        nutrition=entry.nutrition or NutritionInfo(),
+        notes=entry.notes,
+        date=entry.date,
+        created_at=entry.created_at
+    )
+
+# Proyecciones para listados: MongoDB devuelve solo los campos de la respuesta
+class FoodEntryView(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    food_name: str
+    quantity: float
+    unit: str
+    meal_type: MealType
+    category: FoodCategory
+    nutrition: NutritionInfo = Field(default_factory=NutritionInfo)
+    notes: Optional[str] = None
+    date: datetime
+    created_at: datetime
+    
+    def to_response(self) -> FoodEntryResponse:
+        return food_entry_response(self)
+
+class FoodEntryBatchCreate(BaseModel):
+    entries: List[FoodEntryCreate] = Field(..., min_length=1)
+
+class FoodEntryBatchItemResult(BaseModel):
+    index: int
+    success: bool
+    entry: Optional[FoodEntryResponse] = None
+    error: Optional[str] = None
+
+class FoodEntryBatchResponse(BaseModel):
+    inserted_count: int
+    failed_count: int
+    results: List[FoodEntryBatchItemResult]
+
 class WaterEntryCreate(BaseModel):
     amount: float
 
@@ -99,6 +189,24 @@ class WaterEntryResponse(BaseModel):
     date: datetime
     created_at: datetime
 
+def water_entry_response(entry) -> WaterEntryResponse:
+    """Construir la respuesta desde un WaterEntry ya validado, sin volver a validarlo"""
+    return WaterEntryResponse.model_construct(
+        id=str(entry.id),
+        amount=entry.amount,
+        date=entry.date,
+        created_at=entry.created_at
+    )
+
+class WaterEntryView(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    amount: float
+    date: datetime
+    created_at: datetime
+    
+    def to_response(self) -> WaterEntryResponse:
+        return water_entry_response(self)
+
 class DailyNutritionSummary(BaseModel):
     date: datetime
     total_calories: float
@@ -110,6 +218,19 @@ class DailyNutritionSummary(BaseModel):
     meals_by_type: Dict[str, List[FoodEntryResponse]]
     water_entries: List[WaterEntryResponse]
     
+class NutritionRangeSummary(BaseModel):
+    """Totales diarios de un rango en formato columnar (un valor por fecha)"""
+    start_date: Date
+    end_date: Date
+    dates: List[Date]
+    calories: List[float]
+    protein: List[float]
+    carbs: List[float]
+    fats: List[float]
+    fiber: List[float]
+    water: List[float]
+    meals_logged: List[int]
+
 class NutritionGoals(BaseModel):
     daily_calories: Optional[float] = 2000
     daily_protein: Optional[float] = 150  # gramos
@@ -0,0 +1,25 @@
+from beanie import Document
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING
+from datetime import datetime
+
+class RefreshSession(Document):
+    """Sesión de refresh token; solo se guarda el hash del token"""
+    user_id: str
+    email: str
+    token_hash: str
+    expires_at: datetime
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "refresh_sessions"
+        indexes = [
+            IndexModel([("token_hash", ASCENDING)], unique=True),
+            "user_id",
+            # MongoDB elimina las sesiones vencidas automáticamente
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)
+        ]
+
+# Schemas para requests/responses
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
@@ -0,0 +1,74 @@
+from beanie import Document
+from pydantic import BaseModel, Field, model_validator
+from pymongo import IndexModel, ASCENDING
+from typing import Optional, List
+from datetime import datetime
+from enum import Enum
+
+from models.nutrition import FoodEntryCreate, WaterEntryCreate
+from models.analytics import DailyStatsCreate
+
+class SyncOperationType(str, Enum):
+    FOOD = "food"
+    WATER = "water"
+    DAILY_STATS = "daily_stats"
+
+class SyncOperationStatus(str, Enum):
+    APPLIED = "applied"
+    DUPLICATE = "duplicate"
+    FAILED = "failed"
+
+class SyncReceipt(Document):
+    """Registro de operaciones offline ya aplicadas (deduplicación por idempotency key)
+
+    El recibo se reclama como pendiente antes de escribir y se confirma después;
+    uno pendiente más antiguo que SYNC_CLAIM_TIMEOUT_SECONDS se puede reclamar de nuevo.
+    """
+    user_id: str
+    idempotency_key: str
+    operation_type: SyncOperationType
+    result_id: Optional[str] = None
+    pending: bool = False
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "sync_receipts"
+        indexes = [
+            IndexModel(
+                [("user_id", ASCENDING), ("idempotency_key", ASCENDING)],
+                unique=True,
+                name="user_idempotency_key"
+            ),
+            # Los clientes no reintentan operaciones de más de 30 días
+            IndexModel([("created_at", ASCENDING)], expireAfterSeconds=30 * 24 * 3600)
+        ]
+
+# Schemas para requests/responses
+class SyncOperation(BaseModel):
+    idempotency_key: str = Field(..., min_length=1, max_length=128)
+    operation_type: SyncOperationType
+    recorded_at: Optional[datetime] = None  # Momento en que se registró sin conexión
+    food: Optional[FoodEntryCreate] = None
+    water: Optional[WaterEntryCreate] = None
+    daily_stats: Optional[DailyStatsCreate] = None
+    
+    @model_validator(mode="after")
+    def validate_payload(self):
+        if getattr(self, self.operation_type.value) is None:
+            raise ValueError(f"La operación '{self.operation_type.value}' requiere el campo '{self.operation_type.value}'")
+        return self
+
+class SyncPushRequest(BaseModel):
+    operations: List[SyncOperation] = Field(..., min_length=1)
+
+class SyncOperationAck(BaseModel):
+    idempotency_key: str
+    status: SyncOperationStatus
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+class SyncPushResponse(BaseModel):
+    applied: int
+    duplicates: int
+    failed: int
+    acks: List[SyncOperationAck]
@@ -1,8 +1,12 @@
 from beanie import Document
-from pydantic import BaseModel, EmailStr, Field
+from pymongo import IndexModel, ASCENDING
+from pydantic import BaseModel, EmailStr, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from models.nutrition import NutritionGoals
 
 class ActivityLevel(str, Enum):
     SEDENTARY = "sedentary"
@@ -28,6 +32,18 @@ class UserProfile(BaseModel):
     gym_days_per_week: Optional[int] = 3
     medical_conditions: Optional[List[str]] = []
     allergies: Optional[List[str]] = []
+    timezone: Optional[str] = None  # Zona IANA (p. ej. "America/Santiago"); por defecto la del servidor
+    
+    @field_validator("timezone")
+    @classmethod
+    def validate_timezone(cls, value):
+        if value is None:
+            return value
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Zona horaria desconocida: {value}")
+        return value
 
 class User(Document):
     email: EmailStr = Field(..., unique=True)
@@ -35,6 +51,8 @@ class User(Document):
     hashed_password: str
     full_name: Optional[str] = None
     profile: Optional[UserProfile] = Field(default_factory=UserProfile)
+    # Metas calculadas al cambiar el perfil (ver services/nutrition_targets.py)
+    nutrition_goals: Optional[NutritionGoals] = None
     is_active: bool = True
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -43,8 +61,8 @@ class User(Document):
     class Settings:
         name = "users"
         indexes = [
-            "email",
-            "username",
+            IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+            IndexModel([("username", ASCENDING)], unique=True, name="username_unique"),
             "created_at"
         ]
 
@@ -69,11 +87,25 @@ class UserResponse(BaseModel):
     created_at: datetime
     last_login: Optional[datetime] = None
 
+def user_response(user) -> UserResponse:
+    """Construir la respuesta desde un User ya validado, sin volver a validarlo"""
+    return UserResponse.model_construct(
+        id=str(user.id),
+        email=user.email,
+        username=user.username,
+        full_name=user.full_name,
+        profile=user.profile,
+        is_active=user.is_active,
+        created_at=user.created_at,
+        last_login=user.last_login
+    )
+
 class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     profile: Optional[UserProfile] = None
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
     user: UserResponse
\ No newline at end of file
@@ -1,24 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime, timedelta
 from typing import Optional
+import hashlib
+import secrets
 
 from config import settings
-from models.user import User, UserCreate, UserLogin, UserResponse, Token
-from models.notification import NotificationSettings
+from models.user import User, UserCreate, UserLogin, UserResponse, Token, user_response
+from models.session import RefreshSession, RefreshTokenRequest
+from services.nutrition_targets import calculate_nutrition_goals
+from services.password_hasher import password_hasher
+from services.patch_writer import patch_document
+from services.queries import user_by_email
+from services.token_cache import decode_access_token
+from services.user_cache import get_cached_user, cache_user, invalidate_cached_user
 
 router = APIRouter()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -30,15 +37,57 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
+def _hash_refresh_token(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+async def create_refresh_token(user: User) -> str:
+    """Crear una sesión de refresh; solo el hash del token queda en la base de datos"""
+    refresh_token = secrets.token_urlsafe(32)
+    session = RefreshSession(
+        user_id=str(user.id),
+        email=user.email,
+        token_hash=_hash_refresh_token(refresh_token),
+        expires_at=datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)
+    )
+    await session.insert()
+    return refresh_token
+
+async def consume_refresh_token(refresh_token: str) -> Optional[RefreshSession]:
+    """Consumir una sesión de refresh de forma atómica (cada token se usa una sola vez)"""
+    raw_session = await RefreshSession.get_motor_collection().find_one_and_delete(
+        {"token_hash": _hash_refresh_token(refresh_token)}
+    )
+    if not raw_session:
+        return None
+    
+    session = RefreshSession.model_validate(raw_session)
+    # El índice TTL puede tardar hasta un minuto en eliminar sesiones vencidas
+    if session.expires_at <= datetime.utcnow():
+        return None
+    return session
+
 async def get_user_by_email(email: str):
-    return await User.find_one(User.email == email)
+    spec = user_by_email(email)
+    return await spec.model.find_one(spec.filter)
+
+async def get_cached_user_by_email(email: str) -> Optional[User]:
+    user = get_cached_user(email)
+    if user is None:
+        user = await get_user_by_email(email)
+        if user is not None:
+            cache_user(user)
+    return user
 
 async def authenticate_user(email: str, password: str):
     user = await get_user_by_email(email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    is_valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not is_valid:
         return False
+    if new_hash:
+        # El costo de bcrypt cambió: rehash transparente
+        await patch_document(user, {"hashed_password": new_hash})
     return user
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
@@ -48,14 +97,14 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        payload = decode_access_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    user = await get_user_by_email(email)
+    user = await get_cached_user_by_email(email)
     if user is None:
         raise credentials_exception
     return user
@@ -65,38 +114,42 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Usuario inactivo")
     return current_user
 
+def _duplicate_field(error: DuplicateKeyError) -> str:
+    """Campo del índice único que rechazó el registro (email o username)"""
+    details = error.details or {}
+    fields = details.get("keyPattern") or details.get("keyValue") or {}
+    if fields:
+        return "username" if "username" in fields else "email"
+    # Servidores sin keyPattern: el nombre del índice es lo que sigue al primer "index: "
+    # del mensaje (el valor duplicado aparece después)
+    _, _, rest = details.get("errmsg", "").partition(" index: ")
+    return "username" if rest.split(" ", 1)[0] == "username_unique" else "email"
+
 @router.post("/register", response_model=Token)
 async def register(user_data: UserCreate):
-    # Verificar si el usuario ya existe
-    existing_user = await User.find_one(User.email == user_data.email)
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El email ya está registrado"
-        )
-    
-    # Verificar si el username ya existe
-    existing_username = await User.find_one(User.username == user_data.username)
-    if existing_username:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El nombre de usuario ya está en uso"
-        )
-    
-    # Crear nuevo usuario
-    hashed_password = get_password_hash(user_data.password)
+    # Crear nuevo usuario; los índices únicos de email y username detectan duplicados
+    hashed_password = await get_password_hash(user_data.password)
     user = User(
         email=user_data.email,
         username=user_data.username,
         hashed_password=hashed_password,
         full_name=user_data.full_name
     )
+    user.nutrition_goals = calculate_nutrition_goals(user.profile)
     
-    await user.insert()
+    try:
+        await user.insert()
+    except DuplicateKeyError as e:
+        if _duplicate_field(e) == "username":
+            detail = "El nombre de usuario ya está en uso"
+        else:
+            detail = "El email ya está registrado"
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=detail
+        )
     
-    # Crear configuración de notificaciones por defecto
-    notification_settings = NotificationSettings(user_id=str(user.id))
-    await notification_settings.insert()
+    # La configuración de notificaciones se crea al primer uso
     
     # Crear token de acceso
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
@@ -104,18 +157,9 @@ async def register(user_data: UserCreate):
         data={"sub": user.email}, expires_delta=access_token_expires
     )
     
-    user_response = UserResponse(
-        id=str(user.id),
-        email=user.email,
-        username=user.username,
-        full_name=user.full_name,
-        profile=user.profile,
-        is_active=user.is_active,
-        created_at=user.created_at,
-        last_login=user.last_login
-    )
+    refresh_token = await create_refresh_token(user)
     
-    return Token(access_token=access_token, user=user_response)
+    return Token(access_token=access_token, refresh_token=refresh_token, user=user_response(user))
 
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
@@ -128,26 +172,17 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
         )
     
     # Actualizar último login
-    user.last_login = datetime.now()
-    await user.save()
+    await patch_document(user, {"last_login": datetime.now()})
+    invalidate_cached_user(user.email)
     
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
     )
     
-    user_response = UserResponse(
-        id=str(user.id),
-        email=user.email,
-        username=user.username,
-        full_name=user.full_name,
-        profile=user.profile,
-        is_active=user.is_active,
-        created_at=user.created_at,
-        last_login=user.last_login
-    )
+    refresh_token = await create_refresh_token(user)
     
-    return Token(access_token=access_token, user=user_response)
+    return Token(access_token=access_token, refresh_token=refresh_token, user=user_response(user))
 
 @router.post("/login", response_model=Token)
 async def login(user_data: UserLogin):
@@ -159,36 +194,52 @@ async def login(user_data: UserLogin):
         )
     
     # Actualizar último login
-    user.last_login = datetime.now()
-    await user.save()
+    await patch_document(user, {"last_login": datetime.now()})
+    invalidate_cached_user(user.email)
     
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
     )
     
-    user_response = UserResponse(
-        id=str(user.id),
-        email=user.email,
-        username=user.username,
-        full_name=user.full_name,
-        profile=user.profile,
-        is_active=user.is_active,
-        created_at=user.created_at,
-        last_login=user.last_login
+    refresh_token = await create_refresh_token(user)
+    
+    return Token(access_token=access_token, refresh_token=refresh_token, user=user_response(user))
+
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(refresh_data: RefreshTokenRequest):
+    """Emitir un nuevo access token rotando el refresh token, sin pasar por bcrypt"""
+    session = await consume_refresh_token(refresh_data.refresh_token)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token inválido o expirado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    user = await get_cached_user_by_email(session.email)
+    if user is None or not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token inválido o expirado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
+    access_token = create_access_token(
+        data={"sub": user.email}, expires_delta=access_token_expires
     )
     
-    return Token(access_token=access_token, user=user_response)
+    refresh_token = await create_refresh_token(user)
+    
+    return Token(access_token=access_token, refresh_token=refresh_token, user=user_response(user))
+
+@router.post("/logout")
+async def logout(refresh_data: RefreshTokenRequest):
+    """Revocar un refresh token"""
+    await consume_refresh_token(refresh_data.refresh_token)
+    return {"message": "Sesión cerrada exitosamente"}
 
 @router.get("/me", response_model=UserResponse)
 async def read_users_me(current_user: User = Depends(get_current_active_user)):
-    return UserResponse(
-        id=str(current_user.id),
-        email=current_user.email,
-        username=current_user.username,
-        full_name=current_user.full_name,
-        profile=current_user.profile,
-        is_active=current_user.is_active,
-        created_at=current_user.created_at,
-        last_login=current_user.last_login
-    )
\ No newline at end of file
+    return user_response(current_user)
\ No newline at end of file
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from datetime import date
+
+from models.user import User
+from models.export import ExportFormat, ExportDataset
+from routers.auth import get_current_active_user
+from services.exporter import stream_export
+
+router = APIRouter()
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+}
+
+@router.get("")
+async def export_history(
+    format: ExportFormat = Query(ExportFormat.NDJSON),
+    datasets: Optional[List[ExportDataset]] = Query(None),
+    gzip: bool = Query(False),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Exportar el historial completo del usuario en NDJSON o CSV (streaming)"""
+    datasets = datasets or list(ExportDataset)
+
+    if format == ExportFormat.CSV and len(datasets) != 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La exportación CSV requiere exactamente un conjunto de datos (datasets)"
+        )
+
+    name = datasets[0].value if len(datasets) == 1 else "historial"
+    filename = f"rehabilife-{name}-{date.today().isoformat()}.{format.value}"
+    media_type = MEDIA_TYPES[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        stream_export(str(current_user.id), format, datasets, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from typing import AsyncIterator, Optional
+
+from models.user import User
+from models.export import ExportFormat, ExportDataset, ImportSummary
+from routers.auth import get_current_active_user
+from services.importer import import_history, iter_lines
+
+router = APIRouter()
+
+UPLOAD_READ_SIZE = 64 * 1024
+
+@router.post("", response_model=ImportSummary)
+async def import_history_file(
+    file: UploadFile = File(...),
+    format: ExportFormat = Query(ExportFormat.NDJSON),
+    dataset: Optional[ExportDataset] = Query(None),
+    gzip: bool = Query(False),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Importar historial desde otro registro (NDJSON con 'type' o CSV de un conjunto)"""
+    if format == ExportFormat.CSV and dataset is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La importación CSV requiere indicar el conjunto de datos (dataset)"
+        )
+
+    async def chunks() -> AsyncIterator[bytes]:
+        while chunk := await file.read(UPLOAD_READ_SIZE):
+            yield chunk
+
+    return await import_history(
+        str(current_user.id),
+        iter_lines(chunks(), compressed=gzip),
+        format,
+        dataset
+    )
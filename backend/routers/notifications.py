@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Query, Response
 from typing import List, Optional
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime, date, time, timedelta
 import asyncio
 from collections import defaultdict
@@ -12,33 +13,33 @@ from models.notification import (
 )
 from models.nutrition import FoodEntry, WaterEntry
 from routers.auth import get_current_active_user
+from services.day_keys import user_timezone, stamp_day_key, today_for
 from services.notification_service import NotificationService
+from services.pagination import fetch_page, set_next_cursor
+from services.queries import notification_history_page
+from services.patch_writer import patch_document
 
 router = APIRouter()
 notification_service = NotificationService()
 
+async def get_or_create_notification_settings(user_id: str) -> NotificationSettings:
+    """Obtener la configuración de notificaciones, creándola al primer uso"""
+    settings = await NotificationSettings.find_one(NotificationSettings.user_id == user_id)
+    if settings:
+        return settings
+    
+    settings = NotificationSettings(user_id=user_id)
+    try:
+        await settings.insert()
+    except DuplicateKeyError:
+        # Otra petición concurrente la creó primero
+        settings = await NotificationSettings.find_one(NotificationSettings.user_id == user_id)
+    return settings
+
 @router.get("/settings", response_model=NotificationSettingsResponse)
 async def get_notification_settings(current_user: User = Depends(get_current_active_user)):
     """Obtener configuración de notificaciones del usuario"""
-    settings = await NotificationSettings.find_one(
-        NotificationSettings.user_id == str(current_user.id)
-    )
-    
-    if not settings:
-        # Crear configuración por defecto
-        default_reminders = ReminderSettings(
-            meal_times=[time(8, 0), time(13, 0), time(19, 0)],  # 8am, 1pm, 7pm
-            water_interval_minutes=120,  # Cada 2 horas
-            exercise_time=time(18, 0),  # 6pm
-            weight_time=time(7, 0),  # 7am
-            mood_time=time(21, 0)  # 9pm
-        )
-        
-        settings = NotificationSettings(
-            user_id=str(current_user.id),
-            reminders=default_reminders
-        )
-        await settings.insert()
+    settings = await get_or_create_notification_settings(str(current_user.id))
     
     return NotificationSettingsResponse(
         id=str(settings.id),
@@ -57,23 +58,11 @@ async def update_notification_settings(
     current_user: User = Depends(get_current_active_user)
 ):
     """Actualizar configuración de notificaciones"""
-    settings = await NotificationSettings.find_one(
-        NotificationSettings.user_id == str(current_user.id)
-    )
-    
-    if not settings:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Configuración de notificaciones no encontrada"
-        )
+    settings = await get_or_create_notification_settings(str(current_user.id))
     
     update_data = settings_update.dict(exclude_unset=True)
     
-    for field, value in update_data.items():
-        setattr(settings, field, value)
-    
-    settings.updated_at = datetime.utcnow()
-    await settings.save()
+    await patch_document(settings, update_data, on_change={"updated_at": datetime.utcnow()})
     
     return NotificationSettingsResponse(
         id=str(settings.id),
@@ -94,9 +83,7 @@ async def send_notification(
 ):
     """Enviar notificación inmediata"""
     # Verificar configuración de notificaciones
-    settings = await NotificationSettings.find_one(
-        NotificationSettings.user_id == str(current_user.id)
-    )
+    settings = await get_or_create_notification_settings(str(current_user.id))
     
     if not settings or not settings.enabled:
         raise HTTPException(
@@ -121,6 +108,7 @@ async def send_notification(
         message=notification_request.message,
         sent_at=datetime.utcnow()
     )
+    stamp_day_key(notification_log, user_timezone(current_user))
     await notification_log.insert()
     
     # Enviar notificación en background
@@ -142,19 +130,18 @@ async def send_notification(
 
 @router.get("/history", response_model=List[NotificationResponse])
 async def get_notification_history(
-    limit: int = 50,
+    response: Response,
+    limit: int = Query(50, le=100),
     notification_type: Optional[NotificationType] = None,
+    cursor: Optional[str] = Query(None),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Obtener historial de notificaciones"""
-    query = NotificationLog.user_id == str(current_user.id)
-    
-    if notification_type:
-        query = query & (NotificationLog.notification_type == notification_type)
-    
-    notifications = await NotificationLog.find(query).sort(
-        -NotificationLog.sent_at
-    ).limit(limit).to_list()
+    """Obtener historial de notificaciones (paginación por cursor en X-Next-Cursor)"""
+    spec = notification_history_page(str(current_user.id), notification_type, limit)
+    notifications, next_cursor = await fetch_page(
+        spec.model.find(spec.filter), "sent_at", limit, cursor
+    )
+    set_next_cursor(response, next_cursor)
     
     return [
         NotificationResponse(
@@ -174,9 +161,7 @@ async def test_reminder(
     current_user: User = Depends(get_current_active_user)
 ):
     """Probar un tipo específico de recordatorio"""
-    settings = await NotificationSettings.find_one(
-        NotificationSettings.user_id == str(current_user.id)
-    )
+    settings = await get_or_create_notification_settings(str(current_user.id))
     
     if not settings or not settings.enabled:
         raise HTTPException(
@@ -209,6 +194,7 @@ async def test_reminder(
         message=message,
         sent_at=datetime.utcnow()
     )
+    stamp_day_key(notification_log, user_timezone(current_user))
     await notification_log.insert()
     
     # Enviar notificación
@@ -224,26 +210,28 @@ async def test_reminder(
 @router.get("/smart-reminders")
 async def get_smart_reminders(current_user: User = Depends(get_current_active_user)):
     """Obtener recordatorios inteligentes basados en patrones del usuario"""
-    today = date.today()
+    tz = user_timezone(current_user)
+    today = today_for(tz)
+    today_key = today.isoformat()
     yesterday = today - timedelta(days=1)
     
-    # Obtener datos recientes
+    # Obtener datos recientes (ayer y hoy en la zona horaria del usuario)
     recent_food = await FoodEntry.find(
         FoodEntry.user_id == str(current_user.id),
-        FoodEntry.date >= datetime.combine(yesterday, datetime.min.time())
+        FoodEntry.day_key >= yesterday.isoformat()
     ).to_list()
     
     recent_water = await WaterEntry.find(
         WaterEntry.user_id == str(current_user.id),
-        WaterEntry.date >= datetime.combine(yesterday, datetime.min.time())
+        WaterEntry.day_key >= yesterday.isoformat()
     ).to_list()
     
     reminders = []
-    current_hour = datetime.now().hour
+    current_hour = datetime.now(tz).hour
     
     # Recordatorio de desayuno
     if current_hour >= 7 and current_hour <= 10:
-        today_breakfast = [f for f in recent_food if f.meal_type.value == "breakfast" and f.date.date() == today]
+        today_breakfast = [f for f in recent_food if f.meal_type.value == "breakfast" and f.day_key == today_key]
         if not today_breakfast:
             reminders.append({
                 "type": "meal",
@@ -253,7 +241,7 @@ async def get_smart_reminders(current_user: User = Depends(get_current_active_us
             })
     
     # Recordatorio de hidratación
-    today_water = [w for w in recent_water if w.date.date() == today]
+    today_water = [w for w in recent_water if w.day_key == today_key]
     total_water_today = sum(w.amount for w in today_water)
     
     if total_water_today < 500 and current_hour >= 10:
@@ -266,7 +254,7 @@ async def get_smart_reminders(current_user: User = Depends(get_current_active_us
     
     # Recordatorio de almuerzo
     if current_hour >= 12 and current_hour <= 15:
-        today_lunch = [f for f in recent_food if f.meal_type.value == "lunch" and f.date.date() == today]
+        today_lunch = [f for f in recent_food if f.meal_type.value == "lunch" and f.day_key == today_key]
         if not today_lunch:
             reminders.append({
                 "type": "meal",
@@ -287,7 +275,7 @@ async def get_smart_reminders(current_user: User = Depends(get_current_active_us
     
     # Recordatorio de cena
     if current_hour >= 18 and current_hour <= 21:
-        today_dinner = [f for f in recent_food if f.meal_type.value == "dinner" and f.date.date() == today]
+        today_dinner = [f for f in recent_food if f.meal_type.value == "dinner" and f.day_key == today_key]
         if not today_dinner:
             reminders.append({
                 "type": "meal",
@@ -309,9 +297,7 @@ async def schedule_daily_reminders(
     current_user: User = Depends(get_current_active_user)
 ):
     """Programar recordatorios diarios automáticos"""
-    settings = await NotificationSettings.find_one(
-        NotificationSettings.user_id == str(current_user.id)
-    )
+    settings = await get_or_create_notification_settings(str(current_user.id))
     
     if not settings or not settings.enabled:
         raise HTTPException(
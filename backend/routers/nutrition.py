@@ -1,19 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from beanie import PydanticObjectId
+from pymongo.errors import BulkWriteError
 from typing import List, Optional
 from datetime import datetime, date, timedelta
-from collections import defaultdict
+import asyncio
 
+from config import settings
 from models.user import User
 from models.nutrition import (
     FoodEntry, WaterEntry, FoodEntryCreate, FoodEntryResponse,
-    WaterEntryCreate, WaterEntryResponse, DailyNutritionSummary,
+    FoodEntryBatchCreate, FoodEntryBatchItemResult, FoodEntryBatchResponse,
+    FoodEntryView, WaterEntryView, NutritionInfo,
+    food_entry_response, water_entry_response,
+    WaterEntryCreate, WaterEntryResponse, DailyNutritionSummary, NutritionRangeSummary,
     NutritionGoals, MealType, FoodCategory
 )
 from routers.auth import get_current_active_user
-from services.nutrition_advice import get_nutrition_advice
+from services.nutrition_advice import get_nutrition_advice, build_advice_input
+from services.nutrition_targets import get_user_nutrition_goals
+from services.nutrition_rollup import (
+    get_daily_rollup, get_rollup_range, record_food_entries, record_water_entries,
+    record_food_change, record_water_change
+)
+from services.day_keys import user_timezone, stamp_day_key, today_for
+from services.fast_json import fast_response
+from services.pagination import fetch_page, set_next_cursor
+from services.queries import food_entries_page, water_entries_page, day_entries
+from services.patch_writer import patch_document
 
 router = APIRouter()
 
+# Campos que necesitan las respuestas al leer documentos crudos desde agregaciones
+FOOD_RESPONSE_PROJECTION = {
+    "_id": "$_id",
+    "food_name": "$food_name",
+    "quantity": "$quantity",
+    "unit": "$unit",
+    "meal_type": "$meal_type",
+    "category": "$category",
+    "nutrition": "$nutrition",
+    "notes": "$notes",
+    "date": "$date",
+    "created_at": "$created_at"
+}
+
+def _food_response_from_raw(entry: dict) -> FoodEntryResponse:
+    """Construir FoodEntryResponse desde un documento crudo de MongoDB (datos ya validados al escribir)"""
+    return FoodEntryResponse.model_construct(
+        id=str(entry["_id"]),
+        food_name=entry["food_name"],
+        quantity=entry["quantity"],
+        unit=entry["unit"],
+        meal_type=MealType(entry["meal_type"]),
+        category=FoodCategory(entry["category"]),
+        nutrition=NutritionInfo.model_construct(**(entry.get("nutrition") or {})),
+        notes=entry.get("notes"),
+        date=entry["date"],
+        created_at=entry["created_at"]
+    )
+
 @router.post("/food", response_model=FoodEntryResponse)
 async def add_food_entry(food_data: FoodEntryCreate, current_user: User = Depends(get_current_active_user)):
     """Agregar entrada de comida"""
@@ -21,20 +66,63 @@ async def add_food_entry(food_data: FoodEntryCreate, current_user: User = Depend
         user_id=str(current_user.id),
         **food_data.dict()
     )
+    stamp_day_key(food_entry, user_timezone(current_user))
     
     await food_entry.insert()
+    await record_food_entries(str(current_user.id), [food_entry])
+    
+    return food_entry_response(food_entry)
+
+@router.post("/food/batch", response_model=FoodEntryBatchResponse)
+async def add_food_entries_batch(batch_data: FoodEntryBatchCreate, current_user: User = Depends(get_current_active_user)):
+    """Agregar varias entradas de comida (p. ej. una comida completa) en una sola escritura"""
+    if len(batch_data.entries) > settings.food_batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo {settings.food_batch_max_items} entradas por lote"
+        )
+    
+    # Los ids se asignan antes de insertar para poder reportar cada resultado
+    tz = user_timezone(current_user)
+    food_entries = [
+        FoodEntry(
+            id=PydanticObjectId(),
+            user_id=str(current_user.id),
+            **food_data.dict()
+        ) for food_data in batch_data.entries
+    ]
+    for food_entry in food_entries:
+        stamp_day_key(food_entry, tz)
+    
+    errors = {}
+    try:
+        await FoodEntry.insert_many(food_entries, ordered=False)
+    except BulkWriteError as e:
+        # Con ordered=False el resto del lote se escribe igualmente
+        for write_error in e.details.get("writeErrors", []):
+            errors[write_error["index"]] = write_error.get("errmsg", "Error de escritura")
+    
+    await record_food_entries(
+        str(current_user.id),
+        [entry for index, entry in enumerate(food_entries) if index not in errors]
+    )
     
-    return FoodEntryResponse(
-        id=str(food_entry.id),
-        food_name=food_entry.food_name,
-        quantity=food_entry.quantity,
-        unit=food_entry.unit,
-        meal_type=food_entry.meal_type,
-        category=food_entry.category,
-        nutrition=food_entry.nutrition,
-        notes=food_entry.notes,
-        date=food_entry.date,
-        created_at=food_entry.created_at
+    results = []
+    for index, food_entry in enumerate(food_entries):
+        if index in errors:
+            results.append(FoodEntryBatchItemResult(index=index, success=False, error=errors[index]))
+            continue
+        
+        results.append(FoodEntryBatchItemResult(
+            index=index,
+            success=True,
+            entry=food_entry_response(food_entry)
+        ))
+    
+    return FoodEntryBatchResponse(
+        inserted_count=len(food_entries) - len(errors),
+        failed_count=len(errors),
+        results=results
     )
 
 @router.post("/water", response_model=WaterEntryResponse)
@@ -44,79 +132,54 @@ async def add_water_entry(water_data: WaterEntryCreate, current_user: User = Dep
         user_id=str(current_user.id),
         amount=water_data.amount
     )
+    stamp_day_key(water_entry, user_timezone(current_user))
     
     await water_entry.insert()
+    await record_water_entries(str(current_user.id), [water_entry])
     
-    return WaterEntryResponse(
-        id=str(water_entry.id),
-        amount=water_entry.amount,
-        date=water_entry.date,
-        created_at=water_entry.created_at
-    )
+    return water_entry_response(water_entry)
 
 @router.get("/food", response_model=List[FoodEntryResponse])
 async def get_food_entries(
+    response: Response,
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
     meal_type: Optional[MealType] = Query(None),
     category: Optional[FoodCategory] = Query(None),
     limit: int = Query(50, le=100),
+    cursor: Optional[str] = Query(None),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Obtener entradas de comida con filtros"""
-    query_filters = [FoodEntry.user_id == str(current_user.id)]
-    
-    if start_date:
-        query_filters.append(FoodEntry.date >= datetime.combine(start_date, datetime.min.time()))
-    if end_date:
-        query_filters.append(FoodEntry.date <= datetime.combine(end_date, datetime.max.time()))
-    if meal_type:
-        query_filters.append(FoodEntry.meal_type == meal_type)
-    if category:
-        query_filters.append(FoodEntry.category == category)
-    
-    food_entries = await FoodEntry.find(*query_filters).sort(-FoodEntry.date).limit(limit).to_list()
-    
-    return [
-        FoodEntryResponse(
-            id=str(entry.id),
-            food_name=entry.food_name,
-            quantity=entry.quantity,
-            unit=entry.unit,
-            meal_type=entry.meal_type,
-            category=entry.category,
-            nutrition=entry.nutrition,
-            notes=entry.notes,
-            date=entry.date,
-            created_at=entry.created_at
-        ) for entry in food_entries
-    ]
+    """Obtener entradas de comida con filtros (paginación por cursor en X-Next-Cursor)"""
+    # Los límites de cada día se calculan en la zona horaria del usuario
+    spec = food_entries_page(
+        str(current_user.id), user_timezone(current_user),
+        start_date, end_date, meal_type, category, limit
+    )
+    food_entries, next_cursor = await fetch_page(
+        spec.model.find(spec.filter).project(FoodEntryView), "date", limit, cursor
+    )
+    set_next_cursor(response, next_cursor)
+    
+    return fast_response([entry.to_response() for entry in food_entries], response)
 
 @router.get("/water", response_model=List[WaterEntryResponse])
 async def get_water_entries(
+    response: Response,
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
     limit: int = Query(50, le=100),
+    cursor: Optional[str] = Query(None),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Obtener entradas de agua con filtros"""
-    query_filters = [WaterEntry.user_id == str(current_user.id)]
-    
-    if start_date:
-        query_filters.append(WaterEntry.date >= datetime.combine(start_date, datetime.min.time()))
-    if end_date:
-        query_filters.append(WaterEntry.date <= datetime.combine(end_date, datetime.max.time()))
-    
-    water_entries = await WaterEntry.find(*query_filters).sort(-WaterEntry.date).limit(limit).to_list()
-    
-    return [
-        WaterEntryResponse(
-            id=str(entry.id),
-            amount=entry.amount,
-            date=entry.date,
-            created_at=entry.created_at
-        ) for entry in water_entries
-    ]
+    """Obtener entradas de agua con filtros (paginación por cursor en X-Next-Cursor)"""
+    spec = water_entries_page(str(current_user.id), user_timezone(current_user), start_date, end_date, limit)
+    water_entries, next_cursor = await fetch_page(
+        spec.model.find(spec.filter).project(WaterEntryView), "date", limit, cursor
+    )
+    set_next_cursor(response, next_cursor)
+    
+    return fast_response([entry.to_response() for entry in water_entries], response)
 
 @router.get("/daily-summary", response_model=DailyNutritionSummary)
 async def get_daily_nutrition_summary(
@@ -125,71 +188,77 @@ async def get_daily_nutrition_summary(
 ):
     """Obtener resumen nutricional diario"""
     if not target_date:
-        target_date = date.today()
-    
-    start_datetime = datetime.combine(target_date, datetime.min.time())
-    end_datetime = datetime.combine(target_date, datetime.max.time())
-    
-    # Obtener entradas de comida del día
-    food_entries = await FoodEntry.find(
-        FoodEntry.user_id == str(current_user.id),
-        FoodEntry.date >= start_datetime,
-        FoodEntry.date <= end_datetime
-    ).to_list()
-    
-    # Obtener entradas de agua del día
-    water_entries = await WaterEntry.find(
-        WaterEntry.user_id == str(current_user.id),
-        WaterEntry.date >= start_datetime,
-        WaterEntry.date <= end_datetime
-    ).to_list()
-    
-    # Calcular totales nutricionales
-    total_calories = sum(entry.nutrition.calories for entry in food_entries)
-    total_protein = sum(entry.nutrition.protein for entry in food_entries)
-    total_carbs = sum(entry.nutrition.carbs for entry in food_entries)
-    total_fats = sum(entry.nutrition.fats for entry in food_entries)
-    total_fiber = sum(entry.nutrition.fiber for entry in food_entries)
-    total_water = sum(entry.amount for entry in water_entries)
-    
-    # Agrupar comidas por tipo
-    meals_by_type = defaultdict(list)
-    for entry in food_entries:
-        meals_by_type[entry.meal_type.value].append(
-            FoodEntryResponse(
-                id=str(entry.id),
-                food_name=entry.food_name,
-                quantity=entry.quantity,
-                unit=entry.unit,
-                meal_type=entry.meal_type,
-                category=entry.category,
-                nutrition=entry.nutrition,
-                notes=entry.notes,
-                date=entry.date,
-                created_at=entry.created_at
-            )
-        )
-    
-    water_responses = [
-        WaterEntryResponse(
-            id=str(entry.id),
-            amount=entry.amount,
-            date=entry.date,
-            created_at=entry.created_at
-        ) for entry in water_entries
+        target_date = today_for(user_timezone(current_user))
+    
+    # Las entradas del día se buscan por igualdad sobre day_key (índice user_day_key_date)
+    food_spec = day_entries(FoodEntry, str(current_user.id), target_date)
+    water_spec = day_entries(WaterEntry, str(current_user.id), target_date)
+    
+    # Los totales vienen del rollup diario; solo se agrupan las entradas por tipo
+    food_pipeline = [
+        {"$sort": dict(food_spec.sort)},
+        {"$group": {
+            "_id": "$meal_type",
+            "entries": {"$push": FOOD_RESPONSE_PROJECTION}
+        }}
     ]
     
-    return DailyNutritionSummary(
-        date=start_datetime,
-        total_calories=total_calories,
-        total_protein=total_protein,
-        total_carbs=total_carbs,
-        total_fats=total_fats,
-        total_fiber=total_fiber,
-        total_water=total_water,
-        meals_by_type=dict(meals_by_type),
-        water_entries=water_responses
+    rollup, meal_groups, water_entries = await asyncio.gather(
+        get_daily_rollup(str(current_user.id), target_date),
+        FoodEntry.find(food_spec.filter).aggregate(food_pipeline).to_list(),
+        water_spec.find().project(WaterEntryView).to_list()
     )
+    
+    meals_by_type = {
+        group["_id"]: [_food_response_from_raw(entry) for entry in group["entries"]]
+        for group in meal_groups
+    }
+    
+    return fast_response(DailyNutritionSummary.model_construct(
+        date=datetime.combine(target_date, datetime.min.time()),
+        total_calories=rollup.calories,
+        total_protein=rollup.protein,
+        total_carbs=rollup.carbs,
+        total_fats=rollup.fats,
+        total_fiber=rollup.fiber,
+        total_water=rollup.water,
+        meals_by_type=meals_by_type,
+        water_entries=[entry.to_response() for entry in water_entries]
+    ))
+
+@router.get("/range-summary", response_model=NutritionRangeSummary)
+async def get_nutrition_range_summary(
+    start_date: date = Query(...),
+    end_date: date = Query(...),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Obtener totales diarios de un rango en arrays paralelos (para gráficos)"""
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha final debe ser posterior a la inicial"
+        )
+    if (end_date - start_date).days + 1 > settings.range_summary_max_days:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El rango no puede superar {settings.range_summary_max_days} días"
+        )
+    
+    rollups = await get_rollup_range(str(current_user.id), start_date, end_date)
+    
+    # Los días sin registros se completan con ceros para mantener el eje continuo
+    dates = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    columns = {
+        field: [rollups.get(day, {}).get(field, 0) for day in dates]
+        for field in ("calories", "protein", "carbs", "fats", "fiber", "water", "meals_logged")
+    }
+    
+    return fast_response(NutritionRangeSummary.model_construct(
+        start_date=start_date,
+        end_date=end_date,
+        dates=dates,
+        **columns
+    ))
 
 @router.put("/food/{food_id}", response_model=FoodEntryResponse)
 async def update_food_entry(food_id: str, food_data: FoodEntryCreate, current_user: User = Depends(get_current_active_user)):
@@ -202,24 +271,12 @@ async def update_food_entry(food_id: str, food_data: FoodEntryCreate, current_us
             detail="Entrada de comida no encontrada"
         )
     
-    # Actualizar campos
-    for field, value in food_data.dict(exclude_unset=True).items():
-        setattr(food_entry, field, value)
-    
-    await food_entry.save()
-    
-    return FoodEntryResponse(
-        id=str(food_entry.id),
-        food_name=food_entry.food_name,
-        quantity=food_entry.quantity,
-        unit=food_entry.unit,
-        meal_type=food_entry.meal_type,
-        category=food_entry.category,
-        nutrition=food_entry.nutrition,
-        notes=food_entry.notes,
-        date=food_entry.date,
-        created_at=food_entry.created_at
-    )
+    # Actualizar solo los campos modificados
+    previous = food_entry.model_copy(deep=True)
+    if await patch_document(food_entry, food_data.dict(exclude_unset=True)):
+        await record_food_change(str(current_user.id), previous, food_entry)
+    
+    return food_entry_response(food_entry)
 
 @router.put("/water/{water_id}", response_model=WaterEntryResponse)
 async def update_water_entry(water_id: str, water_data: WaterEntryCreate, current_user: User = Depends(get_current_active_user)):
@@ -233,15 +290,11 @@ async def update_water_entry(water_id: str, water_data: WaterEntryCreate, curren
         )
     
     # Actualizar campos
-    water_entry.amount = water_data.amount
-    await water_entry.save()
-    
-    return WaterEntryResponse(
-        id=str(water_entry.id),
-        amount=water_entry.amount,
-        date=water_entry.date,
-        created_at=water_entry.created_at
-    )
+    previous = water_entry.model_copy(deep=True)
+    if await patch_document(water_entry, {"amount": water_data.amount}):
+        await record_water_change(str(current_user.id), previous, water_entry)
+    
+    return water_entry_response(water_entry)
 
 @router.delete("/food/{food_id}")
 async def delete_food_entry(food_id: str, current_user: User = Depends(get_current_active_user)):
@@ -255,6 +308,7 @@ async def delete_food_entry(food_id: str, current_user: User = Depends(get_curre
         )
     
     await food_entry.delete()
+    await record_food_entries(str(current_user.id), [food_entry], sign=-1)
     return {"message": "Entrada de comida eliminada exitosamente"}
 
 @router.delete("/water/{water_id}")
@@ -269,6 +323,7 @@ async def delete_water_entry(water_id: str, current_user: User = Depends(get_cur
         )
     
     await water_entry.delete()
+    await record_water_entries(str(current_user.id), [water_entry], sign=-1)
     return {"message": "Entrada de agua eliminada exitosamente"}
 
 @router.get("/advice")
@@ -278,13 +333,14 @@ async def get_daily_nutrition_advice(
 ):
     """Obtener consejos nutricionales basados en el consumo del día"""
     if not target_date:
-        target_date = date.today()
+        target_date = today_for(user_timezone(current_user))
     
-    # Obtener resumen del día
-    summary = await get_daily_nutrition_summary(target_date, current_user)
+    # Los agregados del rollup bastan para el motor de consejos
+    rollup = await get_daily_rollup(str(current_user.id), target_date)
+    summary = build_advice_input(rollup)
     
-    # Generar consejos personalizados
-    advice = await get_nutrition_advice(summary, current_user)
+    # Generar consejos personalizados (en caché por usuario, día y hora)
+    advice = await get_nutrition_advice(summary, current_user, target_date)
     
     return {
         "date": target_date,
@@ -295,41 +351,5 @@ async def get_daily_nutrition_advice(
 @router.get("/goals", response_model=NutritionGoals)
 async def get_nutrition_goals(current_user: User = Depends(get_current_active_user)):
     """Obtener metas nutricionales del usuario"""
-    # Calcular metas basadas en el perfil del usuario
-    goals = NutritionGoals()
-    
-    if current_user.profile:
-        profile = current_user.profile
-        
-        # Cálculo básico de calorías (Harris-Benedict)
-        if profile.age and profile.weight and profile.height:
-            # Fórmula para hombres (asumiendo, se puede ajustar)
-            bmr = 88.362 + (13.397 * profile.weight) + (4.799 * profile.height) - (5.677 * profile.age)
-            
-            # Factor de actividad
-            activity_multipliers = {
-                "sedentary": 1.2,
-                "light": 1.375,
-                "moderate": 1.55,
-                "active": 1.725,
-                "very_active": 1.9
-            }
-            
-            multiplier = activity_multipliers.get(profile.activity_level.value, 1.55)
-            daily_calories = bmr * multiplier
-            
-            # Ajustar según objetivo
-            if profile.goal == "weight_loss":
-                daily_calories -= 500  # Déficit de 500 cal
-            elif profile.goal == "weight_gain":
-                daily_calories += 500  # Superávit de 500 cal
-            
-            goals.daily_calories = round(daily_calories)
-            goals.daily_protein = round(profile.weight * 2.2)  # 2.2g por kg
-            goals.daily_carbs = round(daily_calories * 0.45 / 4)  # 45% de calorías
-            goals.daily_fats = round(daily_calories * 0.25 / 9)  # 25% de calorías
-            
-            # Agua basada en peso
-            goals.daily_water = round(profile.weight * 35)  # 35ml por kg
-    
-    return goals
\ No newline at end of file
+    # Las metas se calculan al actualizar el perfil
+    return get_user_nutrition_goals(current_user)
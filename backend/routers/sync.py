@@ -0,0 +1,289 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from beanie import PydanticObjectId
+from beanie.odm.utils.encoder import Encoder
+from beanie.operators import In
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from typing import Dict, List, Optional, Set, Tuple
+from datetime import datetime, date, timedelta
+from zoneinfo import ZoneInfo
+import hashlib
+
+from config import settings, logger
+from models.user import User
+from models.nutrition import FoodEntry, WaterEntry
+from models.analytics import DailyStats
+from models.sync import (
+    SyncReceipt, SyncOperation, SyncOperationType, SyncOperationStatus,
+    SyncOperationAck, SyncPushRequest, SyncPushResponse
+)
+from routers.auth import get_current_active_user
+from services.day_keys import user_timezone, stamp_day_key, local_day, today_for
+from services.nutrition_rollup import (
+    entry_day, get_daily_rollup, rollup_to_nutrition_metrics, rebuild_rollups,
+    record_food_entries, record_water_entries
+)
+from services.stats_writer import build_daily_stats_update, on_daily_stats_written
+
+router = APIRouter()
+
+_encoder = Encoder()
+
+DUPLICATE_KEY_ERROR = 11000
+WRITE_ERROR = "Error aplicando la operación"
+IN_PROGRESS_ERROR = "La operación se está aplicando en otra sincronización, reintenta más tarde"
+
+def _stats_date(operation: SyncOperation, tz: ZoneInfo) -> date:
+    if operation.daily_stats.date:
+        return operation.daily_stats.date
+    if operation.recorded_at:
+        return local_day(operation.recorded_at, tz)
+    return today_for(tz)
+
+def _operation_id(user_id: str, idempotency_key: str) -> PydanticObjectId:
+    """Id determinista de la entrada que crea una operación: un reintento escribe el mismo documento"""
+    return PydanticObjectId(hashlib.sha256(f"{user_id}:{idempotency_key}".encode()).digest()[:12])
+
+def _insert_if_missing(entry) -> UpdateOne:
+    document = _encoder.encode(entry)
+    document.pop("revision_id", None)
+    document["_id"] = document.pop("id")
+    return UpdateOne({"_id": document["_id"]}, {"$setOnInsert": document}, upsert=True)
+
+async def _claim_operations(user_id: str, operations: List[SyncOperation]) -> Tuple[Dict[str, SyncOperationAck], Set[str]]:
+    """Reclamar como pendientes los recibos de las operaciones
+
+    Devuelve los acks de las operaciones que no se aplican en esta petición (ya
+    aplicadas o en curso en otra) y las claves de recibos abandonados que se retoman.
+    """
+    acks: Dict[str, SyncOperationAck] = {}
+    reclaimed: Set[str] = set()
+    stale_before = datetime.utcnow() - timedelta(seconds=settings.sync_claim_timeout_seconds)
+    
+    existing_receipts = await SyncReceipt.find(
+        SyncReceipt.user_id == user_id,
+        In(SyncReceipt.idempotency_key, [op.idempotency_key for op in operations])
+    ).to_list()
+    for receipt in existing_receipts:
+        key = receipt.idempotency_key
+        if not receipt.pending:
+            acks[key] = SyncOperationAck(idempotency_key=key, status=SyncOperationStatus.DUPLICATE, id=receipt.result_id)
+            continue
+        # Un recibo pendiente antiguo quedó de una petición que no terminó: se retoma
+        # solo si ninguna otra petición lo retomó antes
+        if receipt.created_at < stale_before:
+            result = await SyncReceipt.get_motor_collection().update_one(
+                {"_id": receipt.id, "pending": True, "created_at": receipt.created_at},
+                {"$set": {"created_at": datetime.utcnow()}}
+            )
+            if result.modified_count:
+                reclaimed.add(key)
+                continue
+        acks[key] = SyncOperationAck(idempotency_key=key, status=SyncOperationStatus.FAILED, error=IN_PROGRESS_ERROR)
+    
+    known = {receipt.idempotency_key for receipt in existing_receipts}
+    receipts = [
+        SyncReceipt(user_id=user_id, idempotency_key=op.idempotency_key, operation_type=op.operation_type, pending=True)
+        for op in operations if op.idempotency_key not in known
+    ]
+    if receipts:
+        try:
+            await SyncReceipt.insert_many(receipts, ordered=False)
+        except BulkWriteError as e:
+            # Otra petición reclamó la misma clave al mismo tiempo
+            for write_error in e.details.get("writeErrors", []):
+                key = receipts[write_error["index"]].idempotency_key
+                acks[key] = SyncOperationAck(idempotency_key=key, status=SyncOperationStatus.FAILED, error=IN_PROGRESS_ERROR)
+    return acks, reclaimed
+
+async def _bulk_write(model, keys: List[str], operations: List[UpdateOne], failed_keys: Dict[str, str]) -> Optional[Tuple[Set[str], Set[str]]]:
+    """Aplicar un bulk_write sin orden y marcar como fallidas solo las operaciones con error
+
+    Devuelve las claves cuyo upsert creó el documento y las que chocaron con un
+    índice único, o None si no se sabe qué operaciones se escribieron.
+    """
+    if not operations:
+        return set(), set()
+    try:
+        details = (await model.get_motor_collection().bulk_write(operations, ordered=False)).bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+    except Exception as e:
+        logger.error(f"Error sincronizando {model.__name__}: {str(e)}")
+        for key in keys:
+            failed_keys[key] = WRITE_ERROR
+        return None
+    
+    duplicates = set()
+    for write_error in details.get("writeErrors", []):
+        key = keys[write_error["index"]]
+        if write_error["code"] == DUPLICATE_KEY_ERROR:
+            duplicates.add(key)
+        else:
+            logger.error(f"Error sincronizando {model.__name__} ({key}): {write_error.get('errmsg')}")
+            failed_keys[key] = WRITE_ERROR
+    return {keys[upsert["index"]] for upsert in details.get("upserted", [])}, duplicates
+
+@router.post("/push", response_model=SyncPushResponse)
+async def push_offline_operations(sync_data: SyncPushRequest, current_user: User = Depends(get_current_active_user)):
+    """Aplicar un lote de operaciones registradas sin conexión, de forma idempotente"""
+    if len(sync_data.operations) > settings.sync_max_operations:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo {settings.sync_max_operations} operaciones por sincronización"
+        )
+    
+    user_id = str(current_user.id)
+    tz = user_timezone(current_user)
+    
+    # Claves repetidas dentro del mismo lote se aplican una sola vez
+    pending: List[SyncOperation] = []
+    batch_keys = set()
+    for op in sync_data.operations:
+        if op.idempotency_key not in batch_keys:
+            batch_keys.add(op.idempotency_key)
+            pending.append(op)
+    
+    # Operaciones ya aplicadas o en curso en otra sincronización
+    acks, reclaimed = await _claim_operations(user_id, pending)
+    pending = [op for op in pending if op.idempotency_key not in acks]
+    
+    by_type: Dict[SyncOperationType, List[SyncOperation]] = {t: [] for t in SyncOperationType}
+    for op in pending:
+        by_type[op.operation_type].append(op)
+    
+    failed_keys: Dict[str, str] = {}
+    
+    # Un bulk_write por colección: primero comida y agua, luego las estadísticas
+    # diarias para que sus métricas nutricionales incluyan lo recién sincronizado
+    food_entries = {
+        op.idempotency_key: FoodEntry(
+            id=_operation_id(user_id, op.idempotency_key),
+            user_id=user_id,
+            date=op.recorded_at or datetime.now(),
+            **op.food.dict()
+        ) for op in by_type[SyncOperationType.FOOD]
+    }
+    water_entries = {
+        op.idempotency_key: WaterEntry(
+            id=_operation_id(user_id, op.idempotency_key),
+            user_id=user_id,
+            amount=op.water.amount,
+            date=op.recorded_at or datetime.now()
+        ) for op in by_type[SyncOperationType.WATER]
+    }
+    
+    for entry in [*food_entries.values(), *water_entries.values()]:
+        stamp_day_key(entry, tz)
+    
+    # Días cuyo rollup no se puede actualizar con deltas: escrituras con resultado
+    # desconocido u operaciones retomadas que pudieron escribirse antes
+    repair_days: Set[date] = set()
+    for model, entries, record in (
+        (FoodEntry, food_entries, record_food_entries),
+        (WaterEntry, water_entries, record_water_entries),
+    ):
+        keys = list(entries)
+        written = await _bulk_write(model, keys, [_insert_if_missing(entries[key]) for key in keys], failed_keys)
+        if written is None:
+            repair_days.update(entry_day(entry) for entry in entries.values())
+            continue
+        inserted, _ = written
+        # Los rollups suman solo las entradas que esta petición creó
+        await record(user_id, [entries[key] for key in keys if key in inserted])
+        repair_days.update(entry_day(entries[key]) for key in keys if key in reclaimed)
+    
+    if repair_days:
+        await rebuild_rollups(user_id, min(repair_days), max(repair_days))
+    
+    stats_ops = by_type[SyncOperationType.DAILY_STATS]
+    stats_dates = {_stats_date(op, tz) for op in stats_ops}
+    nutrition_by_date = {
+        target_date: rollup_to_nutrition_metrics(await get_daily_rollup(user_id, target_date))
+        for target_date in stats_dates
+    }
+    
+    # Las claves aplicadas quedan en `sync_keys` del día: el filtro $ne evita sumar
+    # dos veces los contadores si se retoma una operación que ya se escribió
+    stats_keys = [op.idempotency_key for op in stats_ops]
+    stats_updates = []
+    for op in stats_ops:
+        target_date = _stats_date(op, tz)
+        update = _encoder.encode(
+            build_daily_stats_update(user_id, target_date, op.daily_stats, nutrition_by_date[target_date])
+        )
+        update["$addToSet"] = {"sync_keys": op.idempotency_key}
+        stats_updates.append(UpdateOne(
+            {
+                "user_id": user_id,
+                "date": datetime.combine(target_date, datetime.min.time()),
+                "sync_keys": {"$ne": op.idempotency_key}
+            },
+            update,
+            upsert=True
+        ))
+    
+    written = await _bulk_write(DailyStats, stats_keys, stats_updates, failed_keys)
+    if written and written[1]:
+        # El upsert choca con user_date_unique si el día ya tiene la clave (ya aplicada)
+        # o si otra petición creó el día al mismo tiempo (se reintenta)
+        applied = set()
+        async for stats in DailyStats.get_motor_collection().find(
+            {"user_id": user_id, "sync_keys": {"$in": list(written[1])}}, {"sync_keys": 1}
+        ):
+            applied.update(stats["sync_keys"])
+        for key in written[1] - applied:
+            failed_keys[key] = WRITE_ERROR
+    if stats_dates:
+        await on_daily_stats_written(user_id, min(stats_dates), max(stats_dates))
+    
+    stats_ids = {}
+    if stats_dates:
+        stats_docs = await DailyStats.find(
+            DailyStats.user_id == user_id,
+            In(DailyStats.date, list(stats_dates))
+        ).to_list()
+        stats_ids = {stats.date: str(stats.id) for stats in stats_docs}
+    
+    # Confirmar los recibos de lo aplicado y liberar los de lo fallido para permitir reintentos
+    receipts = SyncReceipt.get_motor_collection()
+    if failed_keys:
+        await receipts.delete_many({"user_id": user_id, "idempotency_key": {"$in": list(failed_keys)}, "pending": True})
+    
+    confirmations = []
+    for op in pending:
+        key = op.idempotency_key
+        if key in failed_keys:
+            acks[key] = SyncOperationAck(idempotency_key=key, status=SyncOperationStatus.FAILED, error=failed_keys[key])
+            continue
+        if op.operation_type == SyncOperationType.DAILY_STATS:
+            result_id = stats_ids.get(_stats_date(op, tz))
+        else:
+            result_id = str(_operation_id(user_id, key))
+        acks[key] = SyncOperationAck(idempotency_key=key, status=SyncOperationStatus.APPLIED, id=result_id)
+        confirmations.append(UpdateOne(
+            {"user_id": user_id, "idempotency_key": key},
+            {"$set": {"pending": False, "result_id": result_id}}
+        ))
+    if confirmations:
+        await receipts.bulk_write(confirmations, ordered=False)
+    
+    ordered_acks = []
+    seen = set()
+    for op in sync_data.operations:
+        if op.idempotency_key in seen:
+            ordered_acks.append(SyncOperationAck(
+                idempotency_key=op.idempotency_key,
+                status=SyncOperationStatus.DUPLICATE,
+                id=acks[op.idempotency_key].id
+            ))
+            continue
+        seen.add(op.idempotency_key)
+        ordered_acks.append(acks[op.idempotency_key])
+    
+    return SyncPushResponse(
+        applied=sum(1 for ack in ordered_acks if ack.status == SyncOperationStatus.APPLIED),
+        duplicates=sum(1 for ack in ordered_acks if ack.status == SyncOperationStatus.DUPLICATE),
+        failed=sum(1 for ack in ordered_acks if ack.status == SyncOperationStatus.FAILED),
+        acks=ordered_acks
+    )
@@ -1,74 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from typing import List
 from datetime import datetime
 
-from models.user import User, UserResponse, UserUpdate
+from models.user import User, UserProfile, UserResponse, UserUpdate, user_response
 from routers.auth import get_current_active_user
+from services.patch_writer import patch_document
+from services.day_keys import user_timezone, today_for
+from services.queries import entries_since, daily_stats_since
+from services.nutrition_advice import invalidate_advice
+from services.analytics_cache import invalidate_analytics
+from services.nutrition_targets import calculate_nutrition_goals, targets_changed
+from services.stats_writer import rekey_user_days
+from services.user_cache import invalidate_cached_user
 
 router = APIRouter()
 
 @router.get("/profile", response_model=UserResponse)
 async def get_user_profile(current_user: User = Depends(get_current_active_user)):
     """Obtener perfil del usuario actual"""
-    return UserResponse(
-        id=str(current_user.id),
-        email=current_user.email,
-        username=current_user.username,
-        full_name=current_user.full_name,
-        profile=current_user.profile,
-        is_active=current_user.is_active,
-        created_at=current_user.created_at,
-        last_login=current_user.last_login
-    )
+    return user_response(current_user)
 
 @router.put("/profile", response_model=UserResponse)
-async def update_user_profile(user_update: UserUpdate, current_user: User = Depends(get_current_active_user)):
+async def update_user_profile(
+    user_update: UserUpdate,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_active_user)
+):
     """Actualizar perfil del usuario"""
     update_data = user_update.dict(exclude_unset=True)
+    previous_timezone = user_timezone(current_user)
+    
+    if "profile" in update_data:
+        # Recalcular metas solo si cambian los datos de los que dependen
+        new_profile = (
+            UserProfile.model_validate(update_data["profile"])
+            if update_data["profile"] is not None else None
+        )
+        if current_user.nutrition_goals is None or targets_changed(current_user.profile, new_profile):
+            update_data["nutrition_goals"] = calculate_nutrition_goals(new_profile)
     
     if update_data:
-        # Actualizar campos
-        for field, value in update_data.items():
-            setattr(current_user, field, value)
-        
-        current_user.updated_at = datetime.utcnow()
-        await current_user.save()
+        # Actualizar solo los campos modificados
+        changes = await patch_document(
+            current_user, update_data, on_change={"updated_at": datetime.utcnow()}
+        )
+        if changes:
+            invalidate_cached_user(current_user.email)
+            # Los objetivos de agua y calorías, las recomendaciones y el progreso de metas dependen del perfil
+            invalidate_advice(str(current_user.id))
+            invalidate_analytics(str(current_user.id))
+            # Los day_key y rollups existentes están en la zona anterior
+            if user_timezone(current_user) != previous_timezone:
+                background_tasks.add_task(rekey_user_days, str(current_user.id))
     
-    return UserResponse(
-        id=str(current_user.id),
-        email=current_user.email,
-        username=current_user.username,
-        full_name=current_user.full_name,
-        profile=current_user.profile,
-        is_active=current_user.is_active,
-        created_at=current_user.created_at,
-        last_login=current_user.last_login
-    )
+    return user_response(current_user)
 
 @router.delete("/profile")
 async def delete_user_account(current_user: User = Depends(get_current_active_user)):
     """Eliminar cuenta de usuario (desactivar)"""
-    current_user.is_active = False
-    current_user.updated_at = datetime.utcnow()
-    await current_user.save()
+    await patch_document(current_user, {"is_active": False}, on_change={"updated_at": datetime.utcnow()})
+    invalidate_cached_user(current_user.email)
     
     return {"message": "Cuenta desactivada exitosamente"}
 
 @router.post("/deactivate")
 async def deactivate_account(current_user: User = Depends(get_current_active_user)):
     """Desactivar cuenta temporalmente"""
-    current_user.is_active = False
-    current_user.updated_at = datetime.utcnow()
-    await current_user.save()
+    await patch_document(current_user, {"is_active": False}, on_change={"updated_at": datetime.utcnow()})
+    invalidate_cached_user(current_user.email)
     
     return {"message": "Cuenta desactivada temporalmente"}
 
 @router.post("/reactivate")
 async def reactivate_account(current_user: User = Depends(get_current_active_user)):
     """Reactivar cuenta"""
-    current_user.is_active = True
-    current_user.updated_at = datetime.utcnow()
-    await current_user.save()
+    await patch_document(current_user, {"is_active": True}, on_change={"updated_at": datetime.utcnow()})
+    invalidate_cached_user(current_user.email)
     
     return {"message": "Cuenta reactivada exitosamente"}
 
@@ -76,27 +83,17 @@ async def reactivate_account(current_user: User = Depends(get_current_active_use
 async def get_user_stats(current_user: User = Depends(get_current_active_user)):
     """Obtener estadísticas básicas del usuario"""
     from models.nutrition import FoodEntry, WaterEntry
-    from models.analytics import DailyStats
     from datetime import date, timedelta
     
-    today = date.today()
+    today = today_for(user_timezone(current_user))
     week_ago = today - timedelta(days=7)
     
     # Contar entradas de la última semana
-    food_entries_count = await FoodEntry.find(
-        FoodEntry.user_id == str(current_user.id),
-        FoodEntry.date >= datetime.combine(week_ago, datetime.min.time())
-    ).count()
-    
-    water_entries_count = await WaterEntry.find(
-        WaterEntry.user_id == str(current_user.id),
-        WaterEntry.date >= datetime.combine(week_ago, datetime.min.time())
-    ).count()
+    # Por day_key, con la fecha para las entradas anteriores a ese campo
+    food_entries_count = await entries_since(FoodEntry, str(current_user.id), week_ago).find().count()
+    water_entries_count = await entries_since(WaterEntry, str(current_user.id), week_ago).find().count()
     
-    daily_stats_count = await DailyStats.find(
-        DailyStats.user_id == str(current_user.id),
-        DailyStats.date >= week_ago
-    ).count()
+    daily_stats_count = await daily_stats_since(str(current_user.id), week_ago).find().count()
     
     # Calcular días desde registro
     days_since_registration = (datetime.utcnow() - current_user.created_at).days
@@ -0,0 +1,47 @@
+from datetime import date, datetime, time, timedelta
+from typing import Any, Hashable, Optional
+from zoneinfo import ZoneInfo
+
+from config import settings
+from services.cache import LRUCache, register_cache
+
+# Resultados de /analytics/summary y /analytics/goals-progress por (usuario, tipo, inicio, fin)
+analytics_cache = register_cache("analytics", LRUCache(max_size=settings.analytics_cache_max_size))
+
+def _seconds_until_midnight(tz: ZoneInfo) -> float:
+    """Segundos hasta el cambio de día del usuario (las ventanas por defecto dependen de hoy)"""
+    now = datetime.now(tz)
+    midnight = datetime.combine(now.date() + timedelta(days=1), time.min, tzinfo=tz)
+    return max((midnight - now).total_seconds(), 1)
+
+def analytics_key(user_id: str, kind: str, start: date, end: date, *extra: Hashable) -> Hashable:
+    """Clave de caché; [start, end] son los días de los que depende el resultado"""
+    return (user_id, kind, start, end, *extra)
+
+def get_cached_analytics(key: Hashable, stamp: Hashable) -> Optional[Any]:
+    """Obtener un resultado analítico en caché si sus datos no cambiaron
+
+    `stamp` es la huella actual de los datos de los que depende (ver
+    period_stats_stamp): la invalidación solo llega al proceso que escribió, así
+    que con varios workers la huella detecta las escrituras hechas en otros.
+    """
+    entry = analytics_cache.get(key)
+    if entry is None or entry[0] != stamp:
+        return None
+    return entry[1]
+
+def cache_analytics(key: Hashable, value: Any, tz: ZoneInfo, stamp: Hashable) -> None:
+    """Guardar un resultado analítico, con la huella leída antes de calcularlo, hasta la medianoche del usuario"""
+    analytics_cache.set(key, (stamp, value), ttl_seconds=_seconds_until_midnight(tz))
+
+def invalidate_analytics(user_id: str, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """Invalidar los resultados cuya ventana incluye días escritos (o todos los del usuario)
+
+    Devuelve la cantidad de entradas eliminadas.
+    """
+    if start is None:
+        return analytics_cache.invalidate_where(lambda key: key[0] == user_id)
+    end = end or start
+    return analytics_cache.invalidate_where(
+        lambda key: key[0] == user_id and key[2] <= end and start <= key[3]
+    )
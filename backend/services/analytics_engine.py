@@ -0,0 +1,131 @@
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from models.analytics import DailyStats, HealthMetric, NutritionMetrics, ActivityMetrics
+from models.user import User
+from services.queries import daily_stats_range
+
+METRIC_SECTIONS = (
+    ("health_metrics", HealthMetric),
+    ("nutrition_metrics", NutritionMetrics),
+    ("activity_metrics", ActivityMetrics),
+)
+
+# Columnas del frame: nombre del campo -> (sección, campo) en el documento DailyStats.
+# Los nombres de campo no se repiten entre secciones.
+FRAME_COLUMNS: Dict[str, Tuple[str, str]] = {
+    field: (section, field)
+    for section, model in METRIC_SECTIONS
+    for field in model.model_fields
+}
+
+def _present(values: np.ndarray) -> np.ndarray:
+    """Máscara de valores registrados (ni NaN ni 0, como un `if valor` en Python)"""
+    return np.nan_to_num(values) != 0
+
+def _mean(values: np.ndarray) -> float:
+    """Promedio contando los faltantes como 0 (los DailyStats usan 0 por defecto)"""
+    return float(np.nan_to_num(values).mean()) if len(values) else 0.0
+
+class DailyStatsFrame:
+    """Estadísticas diarias de un período en columnas NumPy (un float64 por métrica, NaN si falta)
+
+    Las filas están ordenadas por fecha; `dates` es un arreglo datetime64[D].
+    """
+
+    def __init__(self, dates: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.dates = dates
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict]) -> "DailyStatsFrame":
+        """Construir el frame desde documentos crudos de MongoDB ordenados por fecha"""
+        rows = list(rows)
+        dates = [day.date() if isinstance(day, datetime) else day for day in (row["date"] for row in rows)]
+        # Extraer cada sección una vez y luego cada campo por columna
+        sections = {section: [row.get(section) or {} for row in rows] for section, _ in METRIC_SECTIONS}
+
+        # None -> NaN al convertir a float64
+        return cls(
+            np.array(dates, dtype="datetime64[D]"),
+            {
+                name: np.array([values.get(field) for values in sections[section]], dtype=np.float64)
+                for name, (section, field) in FRAME_COLUMNS.items()
+            }
+        )
+
+    @classmethod
+    async def load(cls, user_id: str, start: date, end: date) -> "DailyStatsFrame":
+        """Cargar el período con una consulta proyectada, sin construir documentos Pydantic"""
+        projection = {"_id": 0, "date": 1, **{section: 1 for section, _ in METRIC_SECTIONS}}
+        spec = daily_stats_range(user_id, start, end)
+        cursor = DailyStats.get_motor_collection().find(spec.filter, projection).sort(spec.sort)
+        return cls.from_rows(await cursor.to_list(length=None))
+
+def achievements(frame: DailyStatsFrame, user: User) -> List[str]:
+    """Generar lista de logros"""
+    result = []
+
+    if len(frame) >= 7:
+        result.append("¡7 días consecutivos registrando datos!")
+
+    if len(frame) >= 30:
+        result.append("¡Un mes completo de seguimiento!")
+
+    # Verificar consistencia en hidratación
+    well_hydrated_days = int(np.count_nonzero(np.nan_to_num(frame["water_consumed"]) >= 2000))
+
+    if well_hydrated_days >= len(frame) * 0.8:
+        result.append("¡Excelente hidratación este período!")
+
+    return result
+
+def recommendations(frame: DailyStatsFrame, user: User) -> List[str]:
+    """Generar recomendaciones personalizadas"""
+    result = []
+
+    if not len(frame):
+        return ["Comienza registrando tus comidas y estadísticas diarias."]
+
+    # Analizar hidratación
+    if _mean(frame["water_consumed"]) < 1500:
+        result.append("Intenta beber más agua diariamente. Tu promedio está por debajo del recomendado.")
+
+    # Analizar proteínas
+    avg_protein = _mean(frame["protein_consumed"])
+    if user.profile and user.profile.weight and avg_protein < user.profile.weight * 1.5:
+        result.append("Considera aumentar tu consumo de proteínas para mejor recuperación muscular.")
+
+    # Analizar consistencia
+    if len(frame) < 20:  # Menos de 20 días en el último mes
+        result.append("Trata de ser más consistente con el registro diario de tus comidas y estadísticas.")
+
+    return result
+
+def consistency_metrics(frame: DailyStatsFrame, start_date: date, end_date: date) -> dict:
+    """Calcular métricas de consistencia"""
+    total_days = (end_date - start_date).days + 1
+    logged_days = len(frame)
+
+    days_with_meals = int(np.count_nonzero(np.nan_to_num(frame["meals_logged"]) > 0))
+    days_with_water = int(np.count_nonzero(np.nan_to_num(frame["water_consumed"]) > 0))
+    days_with_health = int(np.count_nonzero(
+        _present(frame["weight"]) | _present(frame["energy_level"]) | _present(frame["mood"])
+    ))
+
+    return {
+        "overall_consistency": round((logged_days / total_days) * 100, 1),
+        "meal_logging_consistency": round((days_with_meals / total_days) * 100, 1),
+        "water_logging_consistency": round((days_with_water / total_days) * 100, 1),
+        "health_metrics_consistency": round((days_with_health / total_days) * 100, 1),
+        "total_days_in_period": total_days,
+        "days_with_data": logged_days
+    }
@@ -0,0 +1,111 @@
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from beanie import PydanticObjectId
+from pymongo import UpdateOne
+
+from config import settings, logger
+from models.user import User
+from models.nutrition import FoodEntry, WaterEntry
+from models.notification import NotificationLog
+
+# Colecciones con day_key: (modelo, campo de fecha, si la fecha naive está en UTC)
+DAY_KEY_SOURCES = (
+    (FoodEntry, "date", False),
+    (WaterEntry, "date", False),
+    (NotificationLog, "sent_at", True),
+)
+
+@lru_cache(maxsize=None)
+def _zone(name: str) -> ZoneInfo:
+    return ZoneInfo(name)
+
+def resolve_timezone(name: Optional[str] = None) -> ZoneInfo:
+    """Zona horaria IANA; la del servidor (settings.timezone) si falta o no es válida"""
+    for candidate in (name, settings.timezone):
+        if not candidate:
+            continue
+        try:
+            return _zone(candidate)
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning(f"Zona horaria desconocida: {candidate}")
+    return _zone("UTC")
+
+def user_timezone(user) -> ZoneInfo:
+    """Zona horaria del perfil del usuario"""
+    profile = getattr(user, "profile", None)
+    return resolve_timezone(getattr(profile, "timezone", None))
+
+def local_day(moment: datetime, tz: ZoneInfo, naive_utc: bool = False) -> date:
+    """Día calendario de un instante en la zona del usuario
+
+    Los datetimes sin zona se interpretan como hora local del servidor
+    (datetime.now), o como UTC si `naive_utc` (datetime.utcnow).
+    """
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc) if naive_utc else moment.astimezone()
+    return moment.astimezone(tz).date()
+
+def day_key(moment: datetime, tz: ZoneInfo, naive_utc: bool = False) -> str:
+    """Clave YYYY-MM-DD del día del usuario al que pertenece un instante"""
+    return local_day(moment, tz, naive_utc).isoformat()
+
+def today_for(tz: ZoneInfo) -> date:
+    return datetime.now(tz).date()
+
+def day_bounds(day: date, tz: ZoneInfo) -> Tuple[datetime, datetime]:
+    """Límites [inicio, fin) de un día del usuario como datetimes locales del servidor
+
+    Es el formato en que se guardan FoodEntry.date y WaterEntry.date.
+    """
+    start = datetime.combine(day, time.min, tzinfo=tz)
+    end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz)
+    return start.astimezone().replace(tzinfo=None), end.astimezone().replace(tzinfo=None)
+
+def stamp_day_key(document, tz: ZoneInfo) -> None:
+    """Asignar day_key a una entrada de comida/agua o a un registro de notificación"""
+    if isinstance(document, NotificationLog):
+        document.day_key = day_key(document.sent_at, tz, naive_utc=True)
+    else:
+        document.day_key = day_key(document.date, tz)
+
+async def backfill_day_keys(
+    user_id: Optional[str] = None,
+    chunk_size: int = 1000,
+    recompute: bool = False
+) -> Dict[str, int]:
+    """Calcular day_key en los documentos escritos antes de que existiera (migración)
+
+    Con `recompute` se recalcula en todos los documentos (p. ej. tras cambiar la
+    zona horaria del usuario) y se escriben solo los que cambian. Devuelve la
+    cantidad de documentos actualizados por colección.
+    """
+    updated = {model.get_settings().name: 0 for model, _, _ in DAY_KEY_SOURCES}
+    user_filter = {"_id": PydanticObjectId(user_id)} if user_id else {}
+
+    async for user in User.get_motor_collection().find(user_filter, {"profile.timezone": 1}):
+        tz = resolve_timezone((user.get("profile") or {}).get("timezone"))
+        owner_id = str(user["_id"])
+
+        for model, field, naive_utc in DAY_KEY_SOURCES:
+            collection = model.get_motor_collection()
+            operations = []
+            query = {"user_id": owner_id} if recompute else {"user_id": owner_id, "day_key": None}
+            cursor = collection.find(query, {field: 1, "day_key": 1})
+            async for document in cursor:
+                key = day_key(document[field], tz, naive_utc)
+                if key == document.get("day_key"):
+                    continue
+                operations.append(UpdateOne({"_id": document["_id"]}, {"$set": {"day_key": key}}))
+                if len(operations) >= chunk_size:
+                    await collection.bulk_write(operations, ordered=False)
+                    updated[model.get_settings().name] += len(operations)
+                    operations = []
+            if operations:
+                await collection.bulk_write(operations, ordered=False)
+                updated[model.get_settings().name] += len(operations)
+
+    logger.info(f"day_key calculado: {updated}")
+    return updated
@@ -0,0 +1,138 @@
+import csv
+import io
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional, Type, get_args
+
+import orjson
+from beanie import Document
+from bson import ObjectId
+from pydantic import BaseModel
+
+from models.export import ExportDataset, ExportFormat
+from models.nutrition import FoodEntry, WaterEntry
+from models.analytics import DailyStats
+from models.notification import NotificationLog
+
+# Colección y orden de cada conjunto; el orden sigue los índices (user_id, campo, _id)
+EXPORT_SOURCES: Dict[ExportDataset, tuple] = {
+    ExportDataset.FOOD: (FoodEntry, "date"),
+    ExportDataset.WATER: (WaterEntry, "date"),
+    ExportDataset.DAILY_STATS: (DailyStats, "date"),
+    ExportDataset.NOTIFICATIONS: (NotificationLog, "sent_at"),
+}
+
+# Campos internos que no se exportan
+EXCLUDED_FIELDS = {"user_id", "revision_id", "sync_keys"}
+
+# Tamaño aproximado de cada bloque enviado al cliente
+CHUNK_SIZE = 64 * 1024
+CURSOR_BATCH_SIZE = 500
+
+def _nested_model(annotation: Any) -> Optional[Type[BaseModel]]:
+    candidates = get_args(annotation) or (annotation,)
+    for candidate in candidates:
+        if isinstance(candidate, type) and issubclass(candidate, BaseModel):
+            return candidate
+    return None
+
+def _columns(model: Type[BaseModel], prefix: str = "") -> List[str]:
+    """Columnas CSV del modelo, aplanando los submodelos con notación de punto"""
+    columns = []
+    for name, field in model.model_fields.items():
+        if not prefix and name in EXCLUDED_FIELDS:
+            continue
+        nested = _nested_model(field.annotation)
+        if nested:
+            columns.extend(_columns(nested, f"{prefix}{name}."))
+        else:
+            columns.append(f"{prefix}{name}")
+    return columns
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+def _clean(document: dict) -> dict:
+    document["id"] = str(document.pop("_id"))
+    for field in EXCLUDED_FIELDS:
+        document.pop(field, None)
+    return document
+
+def _csv_value(document: dict, column: str) -> Any:
+    value: Any = document
+    for part in column.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value, default=_default).decode()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+async def _documents(user_id: str, dataset: ExportDataset) -> AsyncIterator[dict]:
+    """Recorrer un conjunto con un cursor de Motor, sin cargarlo en memoria"""
+    model, sort_field = EXPORT_SOURCES[dataset]
+    collection = model.get_motor_collection()
+    cursor = collection.find({"user_id": user_id}).sort([(sort_field, 1), ("_id", 1)])
+    async for document in cursor.batch_size(CURSOR_BATCH_SIZE):
+        yield _clean(document)
+
+async def _ndjson_lines(user_id: str, datasets: List[ExportDataset]) -> AsyncIterator[bytes]:
+    for dataset in datasets:
+        async for document in _documents(user_id, dataset):
+            document["type"] = dataset.value
+            yield orjson.dumps(document, default=_default) + b"\n"
+
+async def _csv_lines(user_id: str, dataset: ExportDataset) -> AsyncIterator[bytes]:
+    model: Type[Document] = EXPORT_SOURCES[dataset][0]
+    columns = _columns(model)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(columns)
+    async for document in _documents(user_id, dataset):
+        writer.writerow([_csv_value(document, column) for column in columns])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+async def _chunked(lines: AsyncIterator[bytes], compress: bool) -> AsyncIterator[bytes]:
+    """Agrupar líneas en bloques de ~64 KB, comprimiendo con gzip si se pide"""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    pending: List[bytes] = []
+    pending_size = 0
+
+    async for line in lines:
+        pending.append(line)
+        pending_size += len(line)
+        if pending_size >= CHUNK_SIZE:
+            chunk = b"".join(pending)
+            pending, pending_size = [], 0
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    chunk = b"".join(pending)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+def stream_export(
+    user_id: str,
+    export_format: ExportFormat,
+    datasets: List[ExportDataset],
+    compress: bool = False
+) -> AsyncIterator[bytes]:
+    """Generar la exportación del historial del usuario como flujo de bytes"""
+    if export_format == ExportFormat.CSV:
+        lines = _csv_lines(user_id, datasets[0])
+    else:
+        lines = _ndjson_lines(user_id, datasets)
+    return _chunked(lines, compress)
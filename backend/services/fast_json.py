@@ -0,0 +1,39 @@
+from typing import Any, Optional
+
+import orjson
+from bson import ObjectId
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from config import settings
+
+def _default(value: Any) -> Any:
+    """Tipos que orjson no serializa por sí solo"""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+class ORJSONModelResponse(JSONResponse):
+    """Respuesta JSON serializada con orjson, incluidos modelos Pydantic anidados"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+def fast_response(content: Any, response: Optional[Response] = None) -> Any:
+    """Devolver `content` por la ruta rápida si está habilitada
+
+    Al devolver un Response, FastAPI no vuelve a validar el contenido contra
+    `response_model` ni pasa por jsonable_encoder; solo debe usarse con modelos
+    construidos desde datos de la base de datos. Las cabeceras fijadas en el
+    `response` inyectado (p. ej. X-Next-Cursor) se copian a la respuesta.
+    """
+    if not settings.fast_json_responses:
+        return content
+
+    fast = ORJSONModelResponse(content)
+    if response is not None:
+        fast.raw_headers.extend(response.raw_headers)
+    return fast
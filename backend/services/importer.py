@@ -0,0 +1,260 @@
+import csv
+import zlib
+from datetime import date
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import orjson
+from beanie import PydanticObjectId
+from beanie.odm.utils.encoder import Encoder
+from pydantic import ValidationError
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from config import settings, logger
+from models.export import ExportDataset, ExportFormat, IMPORTABLE_DATASETS, ImportRowError, ImportSummary
+from models.nutrition import FoodEntry, WaterEntry
+from models.analytics import DailyStats
+from models.user import User
+from services.day_keys import user_timezone, stamp_day_key
+from services.nutrition_rollup import rebuild_rollups
+from services.stats_writer import sync_nutrition_metrics
+
+# Errores de fila que se reportan como máximo (el resto solo se cuenta)
+MAX_REPORTED_ERRORS = 100
+
+# Campos de la exportación que no se importan: los ids y el dueño se asignan aquí
+IGNORED_FIELDS = ("id", "_id", "user_id", "type", "revision_id")
+
+IMPORT_MODELS = {
+    ExportDataset.FOOD: FoodEntry,
+    ExportDataset.WATER: WaterEntry,
+    ExportDataset.DAILY_STATS: DailyStats,
+}
+
+_encoder = Encoder()
+
+async def iter_lines(chunks: AsyncIterator[bytes], compressed: bool = False) -> AsyncIterator[str]:
+    """Partir un flujo de bytes (opcionalmente gzip) en líneas, sin leerlo completo"""
+    decompressor = zlib.decompressobj(wbits=47) if compressed else None
+    pending = b""
+
+    async for chunk in chunks:
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+
+    if decompressor:
+        pending += decompressor.flush()
+    if pending:
+        yield pending.decode("utf-8").rstrip("\r")
+
+def _unflatten(row: Dict[str, str]) -> Dict[str, Any]:
+    """Convertir columnas con notación de punto (nutrition.calories) en documentos anidados"""
+    record: Dict[str, Any] = {}
+    for column, value in row.items():
+        if value is None or value == "":
+            continue
+        target = record
+        *parents, leaf = column.split(".")
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = value
+    return record
+
+async def _ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Optional[ExportDataset], Any]]:
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = orjson.loads(line)
+            dataset = ExportDataset(record.get("type"))
+        except (orjson.JSONDecodeError, ValueError, AttributeError):
+            yield line_number, None, "Línea NDJSON inválida o sin 'type' válido"
+            continue
+        yield line_number, dataset, record
+
+async def _csv_records(
+    lines: AsyncIterator[str],
+    dataset: ExportDataset
+) -> AsyncIterator[Tuple[int, Optional[ExportDataset], Any]]:
+    header: Optional[List[str]] = None
+    pending: List[str] = []
+    line_number = 0
+    record_line = 0
+
+    async for line in lines:
+        line_number += 1
+        if not pending:
+            record_line = line_number
+        pending.append(line)
+        # Un campo entre comillas puede contener saltos de línea: esperar a que cierre
+        if "\n".join(pending).count('"') % 2:
+            continue
+
+        values = next(csv.reader(["\n".join(pending)]), [])
+        pending = []
+        if header is None:
+            header = values
+            continue
+        if not any(values):
+            continue
+        if len(values) != len(header):
+            yield record_line, None, f"Se esperaban {len(header)} columnas y hay {len(values)}"
+            continue
+        yield record_line, dataset, _unflatten(dict(zip(header, values)))
+
+    if pending:
+        yield record_line, None, "Campo entre comillas sin cerrar al final del archivo"
+
+def _extend_span(span: Optional[Tuple[date, date]], day: date) -> Tuple[date, date]:
+    if span is None:
+        return day, day
+    return min(span[0], day), max(span[1], day)
+
+class _ImportBatch:
+    """Acumula documentos validados y los escribe con bulk_write sin orden por bloques"""
+
+    def __init__(self, user_id: str, chunk_size: int, tz: ZoneInfo):
+        self.user_id = user_id
+        self.tz = tz
+        self.chunk_size = chunk_size
+        self.pending: Dict[ExportDataset, List[Tuple[int, Any]]] = {dataset: [] for dataset in IMPORTABLE_DATASETS}
+        self.inserted: Dict[str, int] = {dataset.value: 0 for dataset in IMPORTABLE_DATASETS}
+        self.errors: List[ImportRowError] = []
+        self.failed_count = 0
+        # Rango de días afectados (inicio, fin) para recalcular derivados al final
+        self.nutrition_span: Optional[Tuple[date, date]] = None
+        self.stats_span: Optional[Tuple[date, date]] = None
+
+    def fail(self, line: int, error: str) -> None:
+        self.failed_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(ImportRowError(line=line, error=error))
+
+    def _operation(self, dataset: ExportDataset, document) -> Any:
+        encoded = _encoder.encode(document)
+        encoded.pop("revision_id", None)
+        if "id" in encoded:
+            encoded["_id"] = encoded.pop("id")
+        if dataset != ExportDataset.DAILY_STATS:
+            return InsertOne(encoded)
+
+        # Un día importado reemplaza los valores registrados de ese día; la nutrición
+        # se recalcula desde los rollups al terminar la importación
+        encoded.pop("_id", None)
+        on_insert = {
+            field: encoded.pop(field)
+            for field in ("user_id", "date", "created_at", "nutrition_metrics")
+        }
+        return UpdateOne(
+            {"user_id": self.user_id, "date": on_insert["date"]},
+            {"$set": encoded, "$setOnInsert": on_insert},
+            upsert=True
+        )
+
+    async def add(self, line: int, dataset: ExportDataset, record: dict) -> None:
+        for field in IGNORED_FIELDS:
+            record.pop(field, None)
+
+        try:
+            document = IMPORT_MODELS[dataset].model_validate({**record, "user_id": self.user_id})
+        except ValidationError as e:
+            error = e.errors()[0]
+            location = ".".join(str(part) for part in error["loc"])
+            self.fail(line, f"{dataset.value}: {location}: {error['msg']}")
+            return
+
+        if dataset != ExportDataset.DAILY_STATS:
+            document.id = PydanticObjectId()
+            stamp_day_key(document, self.tz)
+
+        self.pending[dataset].append((line, document))
+        if len(self.pending[dataset]) >= self.chunk_size:
+            await self.flush(dataset)
+
+    async def flush(self, dataset: ExportDataset) -> None:
+        batch = self.pending[dataset]
+        if not batch:
+            return
+        self.pending[dataset] = []
+
+        operations = [self._operation(dataset, document) for _, document in batch]
+        failed_indexes = set()
+        try:
+            await IMPORT_MODELS[dataset].get_motor_collection().bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Con ordered=False el resto del bloque se escribe igualmente
+            for write_error in e.details.get("writeErrors", []):
+                failed_indexes.add(write_error["index"])
+                self.fail(batch[write_error["index"]][0], write_error.get("errmsg", "Error de escritura"))
+
+        for index, (_, document) in enumerate(batch):
+            if index in failed_indexes:
+                continue
+            self.inserted[dataset.value] += 1
+            if dataset == ExportDataset.DAILY_STATS:
+                self.stats_span = _extend_span(self.stats_span, document.date)
+            else:
+                self.nutrition_span = _extend_span(self.nutrition_span, date.fromisoformat(document.day_key))
+
+    async def flush_all(self) -> None:
+        for dataset in IMPORTABLE_DATASETS:
+            await self.flush(dataset)
+
+async def import_history(
+    user_id: str,
+    lines: AsyncIterator[str],
+    import_format: ExportFormat,
+    dataset: Optional[ExportDataset] = None,
+    chunk_size: Optional[int] = None
+) -> ImportSummary:
+    """Importar historial desde líneas NDJSON (con 'type') o CSV (un conjunto por archivo)
+
+    Los documentos se validan por fila, se escriben en bloques con bulk_write sin
+    orden y los rollups nutricionales se reconstruyen una sola vez al final.
+    """
+    # Los day_key se calculan en la zona horaria del usuario que recibe el historial
+    tz = user_timezone(await User.get(user_id))
+    batch = _ImportBatch(user_id, chunk_size or settings.import_chunk_size, tz)
+
+    if import_format == ExportFormat.CSV:
+        records = _csv_records(lines, dataset)
+    else:
+        records = _ndjson_records(lines)
+
+    async for line, record_dataset, record in records:
+        if record_dataset is None:
+            batch.fail(line, record)
+        elif record_dataset not in IMPORTABLE_DATASETS:
+            batch.fail(line, f"El conjunto '{record_dataset.value}' no se puede importar")
+        else:
+            await batch.add(line, record_dataset, record)
+
+    await batch.flush_all()
+
+    # Derivados: una reconstrucción por importación en lugar de una por fila
+    rollups_rebuilt = 0
+    if batch.nutrition_span:
+        start, end = batch.nutrition_span
+        rollups_rebuilt = await rebuild_rollups(user_id=user_id, start=start, end=end)
+        await sync_nutrition_metrics(user_id, start, end)
+    if batch.stats_span:
+        await sync_nutrition_metrics(user_id, *batch.stats_span)
+
+    logger.info(
+        f"Importación de {user_id}: {batch.inserted} escritos, {batch.failed_count} con errores, "
+        f"{rollups_rebuilt} rollups reconstruidos"
+    )
+
+    return ImportSummary(
+        inserted=batch.inserted,
+        failed_count=batch.failed_count,
+        errors=batch.errors,
+        rollups_rebuilt=rollups_rebuilt
+    )
@@ -0,0 +1,93 @@
+from datetime import timedelta
+from typing import Any, Dict, List, Set, Tuple
+
+from models.nutrition import FoodEntry, WaterEntry, MealType
+from models.analytics import WeeklyStats, MonthlyStats
+from models.notification import NotificationType
+from services.day_keys import resolve_timezone, today_for
+from services.period_stats import period_stats_query
+from services import queries
+
+# Usuario ficticio: el plan elegido no depende de que existan datos
+SAMPLE_USER_ID = "000000000000000000000000"
+
+def _query_plan_checks() -> List[Tuple[str, queries.Query]]:
+    """Consultas de los routers, construidas con los mismos builders que ellos usan"""
+    tz = resolve_timezone()
+    end = today_for(tz)
+    start = end - timedelta(days=30)
+    week_ago = end - timedelta(days=7)
+    
+    return [
+        ("users: login / get_current_user", queries.user_by_email("audit@rehabilife.local")),
+        ("users: GET /stats (comidas)", queries.entries_since(FoodEntry, SAMPLE_USER_ID, week_ago)),
+        ("users: GET /stats (agua)", queries.entries_since(WaterEntry, SAMPLE_USER_ID, week_ago)),
+        ("users: GET /stats (días registrados)", queries.daily_stats_since(SAMPLE_USER_ID, week_ago)),
+        ("nutrition: GET /food", queries.food_entries_page(SAMPLE_USER_ID, tz, start, end)),
+        (
+            "nutrition: GET /food?meal_type",
+            queries.food_entries_page(SAMPLE_USER_ID, tz, start, end, meal_type=MealType.BREAKFAST)
+        ),
+        ("nutrition: daily-summary (comidas)", queries.day_entries(FoodEntry, SAMPLE_USER_ID, end)),
+        ("nutrition: daily-summary (agua)", queries.day_entries(WaterEntry, SAMPLE_USER_ID, end)),
+        ("nutrition: GET /range-summary", queries.rollup_range(SAMPLE_USER_ID, start, end)),
+        ("nutrition: GET /water", queries.water_entries_page(SAMPLE_USER_ID, tz, start, end)),
+        ("analytics: GET /daily-stats", queries.daily_stats_page(SAMPLE_USER_ID, start, end)),
+        ("analytics: GET /summary", queries.daily_stats_range(SAMPLE_USER_ID, start, end)),
+        ("analytics: GET /goals-progress", queries.recent_daily_stats(SAMPLE_USER_ID, week_ago)),
+        ("analytics: GET /weekly-stats", period_stats_query(WeeklyStats, SAMPLE_USER_ID, start, end)),
+        (
+            "analytics: GET /monthly-stats (y progreso mensual de /summary)",
+            period_stats_query(MonthlyStats, SAMPLE_USER_ID, start, end)
+        ),
+        ("notifications: GET /history", queries.notification_history_page(SAMPLE_USER_ID)),
+        (
+            "notifications: GET /history?notification_type",
+            queries.notification_history_page(SAMPLE_USER_ID, NotificationType.WATER_REMINDER)
+        )
+    ]
+
+def _collect_stages(plan: Any, stages: Set[str]) -> Set[str]:
+    """Recorrer el plan de ejecución y recolectar los nombres de etapas"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for value in plan.values():
+            _collect_stages(value, stages)
+    elif isinstance(plan, list):
+        for item in plan:
+            _collect_stages(item, stages)
+    return stages
+
+async def audit_query_plans() -> List[Dict[str, Any]]:
+    """Ejecutar explain() sobre cada consulta y verificar IXSCAN sin SORT en memoria"""
+    results = []
+    
+    for name, spec in _query_plan_checks():
+        cursor = spec.model.get_motor_collection().find(spec.filter)
+        if spec.sort:
+            cursor = cursor.sort(spec.sort)
+        if spec.limit:
+            cursor = cursor.limit(spec.limit)
+        
+        explanation = await cursor.explain()
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        stages = _collect_stages(winning_plan, set())
+        
+        problems = []
+        if "IXSCAN" not in stages and "IDHACK" not in stages:
+            problems.append("no usa índice (IXSCAN)")
+        if "COLLSCAN" in stages:
+            problems.append("recorre la colección completa (COLLSCAN)")
+        if "SORT" in stages:
+            problems.append("ordena en memoria (SORT)")
+        
+        results.append({
+            "name": name,
+            "collection": spec.model.get_motor_collection().name,
+            "stages": sorted(stages),
+            "ok": not problems,
+            "problems": problems
+        })
+    
+    return results
@@ -303,7 +303,7 @@ class NotificationService:
             
             for notification in notifications:
                 stats["by_type"][notification.notification_type.value] += 1
-                day_key = notification.sent_at.strftime("%Y-%m-%d")
+                day_key = notification.day_key or notification.sent_at.strftime("%Y-%m-%d")
                 stats["by_day"][day_key] += 1
             
             stats["delivery_rate"] = (stats["delivered"] / stats["total_sent"]) * 100 if stats["total_sent"] > 0 else 0
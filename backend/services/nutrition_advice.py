@@ -1,7 +1,30 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime, date
+import random
+
+from pydantic import BaseModel
+
+from config import settings
 from models.user import User
-from models.nutrition import DailyNutritionSummary, FoodCategory, MealType
+from services.cache import LRUCache, register_cache
+from services.day_keys import user_timezone
+from services.nutrition_targets import get_user_nutrition_goals
+
+class NutritionAdviceInput(BaseModel):
+    """Agregados del día que necesita el motor de consejos"""
+    total_calories: float = 0
+    total_water: float = 0
+    total_meals: int = 0
+    breakfast_entries: int = 0
+    breakfast_protein: float = 0
+    alcohol_entries: int = 0
+    processed_entries: int = 0
+
+# Consejos por (usuario, día, hora); se invalidan con cada escritura nutricional del día
+advice_cache = register_cache("nutrition_advice", LRUCache(
+    max_size=settings.advice_cache_max_size,
+    ttl_seconds=3600
+))
 
 class NutritionAdviceEngine:
     """Motor de consejos nutricionales inteligentes"""
@@ -65,177 +88,167 @@ class NutritionAdviceEngine:
             ]
         }
     
-    async def generate_advice(self, summary: DailyNutritionSummary, user: User) -> List[str]:
-        """Generar consejos personalizados basados en el resumen nutricional"""
+    async def generate_advice(self, summary: NutritionAdviceInput, user: User, day: date, hour: int) -> List[str]:
+        """Generar consejos personalizados basados en los agregados del día
+        
+        La selección es determinista por usuario y día, así el resultado en
+        caché coincide con el que se calcularía de nuevo.
+        """
+        seed = f"{user.id}:{day.isoformat()}"
         advice = []
         
         # Análisis de desayuno
-        breakfast_advice = self._analyze_breakfast(summary)
+        breakfast_advice = self._analyze_breakfast(summary, seed)
         if breakfast_advice:
             advice.extend(breakfast_advice)
         
         # Análisis de alcohol
-        alcohol_advice = self._analyze_alcohol_consumption(summary)
+        alcohol_advice = self._analyze_alcohol_consumption(summary, seed)
         if alcohol_advice:
             advice.extend(alcohol_advice)
         
         # Análisis de hidratación
-        hydration_advice = self._analyze_hydration(summary, user)
+        hydration_advice = self._analyze_hydration(summary, user, seed)
         if hydration_advice:
             advice.extend(hydration_advice)
         
         # Análisis de alimentos procesados
-        processed_advice = self._analyze_processed_foods(summary)
+        processed_advice = self._analyze_processed_foods(summary, seed)
         if processed_advice:
             advice.extend(processed_advice)
         
         # Análisis calórico
-        calorie_advice = self._analyze_calories(summary, user)
+        calorie_advice = self._analyze_calories(summary, user, seed)
         if calorie_advice:
             advice.extend(calorie_advice)
         
         # Consejos de ejercicio
-        exercise_advice = self._generate_exercise_advice(user)
+        exercise_advice = self._generate_exercise_advice(user, hour, seed)
         if exercise_advice:
             advice.extend(exercise_advice)
         
         # Consejos de horario
-        timing_advice = self._generate_timing_advice()
+        timing_advice = self._generate_timing_advice(hour, seed)
         if timing_advice:
             advice.extend(timing_advice)
         
         # Si todo está bien, dar refuerzo positivo
         if not advice:
-            advice.extend(self._get_random_advice("good_balance"))
+            advice.extend(self._get_random_advice("good_balance", seed))
         
         return advice[:3]  # Máximo 3 consejos por día
     
-    def _analyze_breakfast(self, summary: DailyNutritionSummary) -> List[str]:
+    def _analyze_breakfast(self, summary: NutritionAdviceInput, seed: str) -> List[str]:
         """Analizar el desayuno del usuario"""
-        breakfast_meals = summary.meals_by_type.get(MealType.BREAKFAST.value, [])
-        
-        if not breakfast_meals:
+        if not summary.breakfast_entries:
             return ["No has registrado desayuno hoy. Es la comida más importante del día."]
         
-        total_protein = sum(meal.nutrition.protein for meal in breakfast_meals)
+        total_protein = summary.breakfast_protein
         
         if total_protein >= 20:
-            return self._get_random_advice("high_protein_breakfast")
+            return self._get_random_advice("high_protein_breakfast", seed)
         elif total_protein < 10:
-            return self._get_random_advice("low_protein_breakfast")
+            return self._get_random_advice("low_protein_breakfast", seed)
         
         return []
     
-    def _analyze_alcohol_consumption(self, summary: DailyNutritionSummary) -> List[str]:
+    def _analyze_alcohol_consumption(self, summary: NutritionAdviceInput, seed: str) -> List[str]:
         """Analizar consumo de alcohol"""
-        alcohol_entries = []
-        
-        for meal_type, meals in summary.meals_by_type.items():
-            for meal in meals:
-                if meal.category == FoodCategory.ALCOHOL:
-                    alcohol_entries.append(meal)
-        
-        if alcohol_entries:
-            return self._get_random_advice("alcohol_consumed")
+        if summary.alcohol_entries > 0:
+            return self._get_random_advice("alcohol_consumed", seed)
         
         return []
     
-    def _analyze_hydration(self, summary: DailyNutritionSummary, user: User) -> List[str]:
+    def _analyze_hydration(self, summary: NutritionAdviceInput, user: User, seed: str) -> List[str]:
         """Analizar hidratación"""
-        target_water = 2000  # ml por defecto
-        
-        if user.profile and user.profile.weight:
-            target_water = user.profile.weight * 35  # 35ml por kg
+        target_water = get_user_nutrition_goals(user).daily_water
         
         if summary.total_water < target_water * 0.7:  # Menos del 70% del objetivo
-            return self._get_random_advice("low_water")
+            return self._get_random_advice("low_water", seed)
         
         return []
     
-    def _analyze_processed_foods(self, summary: DailyNutritionSummary) -> List[str]:
+    def _analyze_processed_foods(self, summary: NutritionAdviceInput, seed: str) -> List[str]:
         """Analizar consumo de alimentos procesados"""
-        processed_count = 0
-        total_meals = 0
-        
-        for meal_type, meals in summary.meals_by_type.items():
-            for meal in meals:
-                total_meals += 1
-                if meal.category == FoodCategory.PROCESSED:
-                    processed_count += 1
+        processed_count = summary.processed_entries
+        total_meals = summary.total_meals
         
         if total_meals > 0 and (processed_count / total_meals) > 0.4:  # Más del 40% procesados
-            return self._get_random_advice("high_processed_food")
+            return self._get_random_advice("high_processed_food", seed)
         
         return []
     
-    def _analyze_calories(self, summary: DailyNutritionSummary, user: User) -> List[str]:
+    def _analyze_calories(self, summary: NutritionAdviceInput, user: User, seed: str) -> List[str]:
         """Analizar consumo calórico"""
-        target_calories = 2000  # Por defecto
-        
-        # Calcular calorías objetivo basado en perfil
-        if user.profile and user.profile.age and user.profile.weight and user.profile.height:
-            # Cálculo básico BMR
-            bmr = 88.362 + (13.397 * user.profile.weight) + (4.799 * user.profile.height) - (5.677 * user.profile.age)
-            
-            activity_multipliers = {
-                "sedentary": 1.2,
-                "light": 1.375,
-                "moderate": 1.55,
-                "active": 1.725,
-                "very_active": 1.9
-            }
-            
-            multiplier = activity_multipliers.get(user.profile.activity_level.value, 1.55)
-            target_calories = bmr * multiplier
-            
-            if user.profile.goal == "weight_loss":
-                target_calories -= 500
-            elif user.profile.goal == "weight_gain":
-                target_calories += 500
+        target_calories = get_user_nutrition_goals(user).daily_calories
         
         if summary.total_calories < target_calories * 0.8:  # Menos del 80%
-            return self._get_random_advice("low_calories")
+            return self._get_random_advice("low_calories", seed)
         elif summary.total_calories > target_calories * 1.2:  # Más del 120%
-            return self._get_random_advice("high_calories")
+            return self._get_random_advice("high_calories", seed)
         
         return []
     
-    def _generate_exercise_advice(self, user: User) -> List[str]:
+    def _generate_exercise_advice(self, user: User, current_hour: int, seed: str) -> List[str]:
         """Generar consejos relacionados con ejercicio"""
-        current_hour = datetime.now().hour
         
         # Consejos pre-entrenamiento (tarde)
         if 15 <= current_hour <= 18 and user.profile and user.profile.gym_days_per_week >= 3:
-            return self._get_random_advice("pre_workout")
+            return self._get_random_advice("pre_workout", seed)
         
         # Consejos post-entrenamiento (noche)
         if 19 <= current_hour <= 21:
-            return self._get_random_advice("post_workout")
+            return self._get_random_advice("post_workout", seed)
         
         return []
     
-    def _generate_timing_advice(self) -> List[str]:
+    def _generate_timing_advice(self, current_hour: int, seed: str) -> List[str]:
         """Generar consejos basados en la hora del día"""
-        current_hour = datetime.now().hour
         
         # Consejos para la cena
         if 18 <= current_hour <= 20:
-            return self._get_random_advice("evening_advice")
+            return self._get_random_advice("evening_advice", seed)
         
         return []
     
-    def _get_random_advice(self, category: str) -> List[str]:
-        """Obtener consejo aleatorio de una categoría"""
-        import random
-        
+    def _get_random_advice(self, category: str, seed: str) -> List[str]:
+        """Obtener consejo de una categoría, elegido de forma determinista por usuario y día"""
         if category in self.advice_templates:
-            return [random.choice(self.advice_templates[category])]
+            rng = random.Random(f"{seed}:{category}")
+            return [rng.choice(self.advice_templates[category])]
         
         return []
 
 # Instancia global del motor de consejos
 advice_engine = NutritionAdviceEngine()
 
-async def get_nutrition_advice(summary: DailyNutritionSummary, user: User) -> List[str]:
-    """Función principal para obtener consejos nutricionales"""
-    return await advice_engine.generate_advice(summary, user)
\ No newline at end of file
+def build_advice_input(rollup) -> NutritionAdviceInput:
+    """Construir la entrada del motor desde el rollup nutricional del día"""
+    return NutritionAdviceInput(
+        total_calories=rollup.calories,
+        total_water=rollup.water,
+        total_meals=rollup.meals_logged,
+        breakfast_entries=rollup.breakfast_entries,
+        breakfast_protein=rollup.breakfast_protein,
+        alcohol_entries=rollup.alcohol_entries,
+        processed_entries=rollup.processed_entries
+    )
+
+def invalidate_advice(user_id: str, day: Optional[date] = None) -> None:
+    """Invalidar consejos en caché de un usuario (de un día o de todos)"""
+    if day is None:
+        advice_cache.invalidate_where(lambda key: key[0] == user_id)
+        return
+    for hour in range(24):
+        advice_cache.invalidate((user_id, day, hour))
+
+async def get_nutrition_advice(summary: NutritionAdviceInput, user: User, day: date) -> List[str]:
+    """Función principal para obtener consejos nutricionales (con caché por hora)"""
+    hour = datetime.now(user_timezone(user)).hour
+    cache_key = (str(user.id), day, hour)
+    
+    advice = advice_cache.get(cache_key)
+    if advice is None:
+        advice = await advice_engine.generate_advice(summary, user, day, hour)
+        advice_cache.set(cache_key, advice)
+    return advice
\ No newline at end of file
@@ -0,0 +1,231 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+from beanie import BulkWriter
+
+from config import logger
+from models.nutrition import DailyNutritionRollup, FoodEntry, WaterEntry, FoodCategory, MealType
+from models.analytics import NutritionMetrics
+from services.nutrition_advice import advice_cache, invalidate_advice
+from services.queries import day_match, entry_day_match, rollup_range
+
+ROLLUP_FIELDS = [
+    "calories", "protein", "carbs", "fats", "fiber",
+    "water", "meals_logged", "water_entries", "alcohol_units",
+    "alcohol_entries", "processed_entries", "breakfast_entries", "breakfast_protein"
+]
+
+def entry_day(entry) -> date:
+    """Día del usuario al que pertenece una entrada de comida o agua"""
+    if entry.day_key:
+        return date.fromisoformat(entry.day_key)
+    # Entradas anteriores a day_key (ver manage.py backfill-day-keys)
+    return entry.date.date()
+
+def food_deltas(entry: FoodEntry, sign: int = 1) -> Dict[str, float]:
+    """Aporte de una entrada de comida a los totales del día"""
+    nutrition = entry.nutrition
+    is_alcohol = entry.category == FoodCategory.ALCOHOL
+    is_breakfast = entry.meal_type == MealType.BREAKFAST
+    return {
+        "calories": sign * (nutrition.calories or 0),
+        "protein": sign * (nutrition.protein or 0),
+        "carbs": sign * (nutrition.carbs or 0),
+        "fats": sign * (nutrition.fats or 0),
+        "fiber": sign * (nutrition.fiber or 0),
+        "meals_logged": sign,
+        "alcohol_units": sign * entry.quantity if is_alcohol else 0,
+        "alcohol_entries": sign if is_alcohol else 0,
+        "processed_entries": sign if entry.category == FoodCategory.PROCESSED else 0,
+        "breakfast_entries": sign if is_breakfast else 0,
+        "breakfast_protein": sign * (nutrition.protein or 0) if is_breakfast else 0
+    }
+
+def water_deltas(entry: WaterEntry, sign: int = 1) -> Dict[str, float]:
+    """Aporte de una entrada de agua a los totales del día"""
+    return {
+        "water": sign * entry.amount,
+        "water_entries": sign
+    }
+
+async def _apply_deltas(user_id: str, deltas_by_day: Dict[date, Dict[str, float]]) -> None:
+    """Aplicar los deltas con $inc atómico, un upsert por día en un solo bulk_write"""
+    deltas_by_day = {
+        day: {field: value for field, value in deltas.items() if value}
+        for day, deltas in deltas_by_day.items()
+    }
+    deltas_by_day = {day: deltas for day, deltas in deltas_by_day.items() if deltas}
+    if not deltas_by_day:
+        return
+    
+    now = datetime.utcnow()
+    async with BulkWriter() as bulk_writer:
+        for day, deltas in deltas_by_day.items():
+            await DailyNutritionRollup.find_one(
+                DailyNutritionRollup.user_id == user_id,
+                DailyNutritionRollup.date == day
+            ).update(
+                {"$inc": deltas, "$set": {"updated_at": now}},
+                upsert=True,
+                bulk_writer=bulk_writer
+            )
+
+    # Invalidar después del commit: una lectura concurrente no debe volver a cachear
+    # consejos calculados con el rollup anterior
+    for day in deltas_by_day:
+        invalidate_advice(user_id, day)
+
+def _merge(target: Dict[date, Dict[str, float]], day: date, deltas: Dict[str, float]) -> None:
+    day_deltas = target.setdefault(day, defaultdict(float))
+    for field, value in deltas.items():
+        day_deltas[field] += value
+
+async def record_food_entries(user_id: str, entries: Iterable[FoodEntry], sign: int = 1) -> None:
+    """Sumar (sign=1) o restar (sign=-1) entradas de comida en los rollups"""
+    deltas_by_day: Dict[date, Dict[str, float]] = {}
+    for entry in entries:
+        _merge(deltas_by_day, entry_day(entry), food_deltas(entry, sign))
+    await _apply_deltas(user_id, deltas_by_day)
+
+async def record_water_entries(user_id: str, entries: Iterable[WaterEntry], sign: int = 1) -> None:
+    """Sumar (sign=1) o restar (sign=-1) entradas de agua en los rollups"""
+    deltas_by_day: Dict[date, Dict[str, float]] = {}
+    for entry in entries:
+        _merge(deltas_by_day, entry_day(entry), water_deltas(entry, sign))
+    await _apply_deltas(user_id, deltas_by_day)
+
+async def record_food_change(user_id: str, previous: FoodEntry, current: FoodEntry) -> None:
+    """Reemplazar el aporte de una entrada de comida modificada"""
+    deltas_by_day: Dict[date, Dict[str, float]] = {}
+    _merge(deltas_by_day, entry_day(previous), food_deltas(previous, -1))
+    _merge(deltas_by_day, entry_day(current), food_deltas(current, 1))
+    await _apply_deltas(user_id, deltas_by_day)
+
+async def record_water_change(user_id: str, previous: WaterEntry, current: WaterEntry) -> None:
+    """Reemplazar el aporte de una entrada de agua modificada"""
+    deltas_by_day: Dict[date, Dict[str, float]] = {}
+    _merge(deltas_by_day, entry_day(previous), water_deltas(previous, -1))
+    _merge(deltas_by_day, entry_day(current), water_deltas(current, 1))
+    await _apply_deltas(user_id, deltas_by_day)
+
+async def get_daily_rollup(user_id: str, day: date) -> DailyNutritionRollup:
+    """Obtener los totales del día (vacíos si no hay registros)"""
+    rollup = await DailyNutritionRollup.find_one(
+        DailyNutritionRollup.user_id == user_id,
+        DailyNutritionRollup.date == day
+    )
+    return rollup or DailyNutritionRollup(user_id=user_id, date=day)
+
+async def get_rollup_range(user_id: str, start: date, end: date) -> Dict[date, dict]:
+    """Obtener los rollups de un rango de días en una sola consulta (día -> totales)"""
+    spec = rollup_range(user_id, start, end)
+    cursor = spec.model.get_motor_collection().find(
+        spec.filter,
+        {"_id": 0, "date": 1, **{field: 1 for field in ROLLUP_FIELDS}}
+    )
+    return {row["date"].date(): row async for row in cursor}
+
+def rollup_values_to_nutrition_metrics(values: dict) -> NutritionMetrics:
+    """Convertir totales crudos de un rollup (p. ej. de get_rollup_range) en métricas"""
+    return NutritionMetrics(
+        calories_consumed=values.get("calories", 0),
+        protein_consumed=values.get("protein", 0),
+        carbs_consumed=values.get("carbs", 0),
+        fats_consumed=values.get("fats", 0),
+        water_consumed=values.get("water", 0),
+        meals_logged=values.get("meals_logged", 0),
+        alcohol_units=values.get("alcohol_units", 0)
+    )
+
+def rollup_to_nutrition_metrics(rollup: DailyNutritionRollup) -> NutritionMetrics:
+    return rollup_values_to_nutrition_metrics(rollup.model_dump())
+
+async def rebuild_rollups(
+    user_id: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> int:
+    """Reconstruir los rollups desde las entradas crudas (job de reparación)
+    
+    Devuelve la cantidad de rollups escritos.
+    """
+    match = entry_day_match(user_id, start, end)
+    day_key = {"$ifNull": ["$day_key", {"$dateToString": {"format": "%Y-%m-%d", "date": "$date"}}]}
+    
+    food_pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "day": day_key},
+            "calories": {"$sum": "$nutrition.calories"},
+            "protein": {"$sum": "$nutrition.protein"},
+            "carbs": {"$sum": "$nutrition.carbs"},
+            "fats": {"$sum": "$nutrition.fats"},
+            "fiber": {"$sum": "$nutrition.fiber"},
+            "meals_logged": {"$sum": 1},
+            "alcohol_units": {"$sum": {"$cond": [
+                {"$eq": ["$category", FoodCategory.ALCOHOL.value]}, "$quantity", 0
+            ]}},
+            "alcohol_entries": {"$sum": {"$cond": [
+                {"$eq": ["$category", FoodCategory.ALCOHOL.value]}, 1, 0
+            ]}},
+            "processed_entries": {"$sum": {"$cond": [
+                {"$eq": ["$category", FoodCategory.PROCESSED.value]}, 1, 0
+            ]}},
+            "breakfast_entries": {"$sum": {"$cond": [
+                {"$eq": ["$meal_type", MealType.BREAKFAST.value]}, 1, 0
+            ]}},
+            "breakfast_protein": {"$sum": {"$cond": [
+                {"$eq": ["$meal_type", MealType.BREAKFAST.value]}, "$nutrition.protein", 0
+            ]}}
+        }}
+    ]
+    water_pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "day": day_key},
+            "water": {"$sum": "$amount"},
+            "water_entries": {"$sum": 1}
+        }}
+    ]
+    
+    totals: Dict[tuple, Dict[str, float]] = defaultdict(lambda: {field: 0 for field in ROLLUP_FIELDS})
+    async for row in FoodEntry.get_motor_collection().aggregate(food_pipeline):
+        key = (row["_id"]["user_id"], date.fromisoformat(row["_id"]["day"]))
+        totals[key].update({field: row[field] for field in row if field != "_id"})
+    async for row in WaterEntry.get_motor_collection().aggregate(water_pipeline):
+        key = (row["_id"]["user_id"], date.fromisoformat(row["_id"]["day"]))
+        totals[key].update({field: row[field] for field in row if field != "_id"})
+    
+    now = datetime.utcnow()
+    written = 0
+    
+    if totals:
+        async with BulkWriter() as bulk_writer:
+            for (rollup_user_id, day), values in totals.items():
+                await DailyNutritionRollup.find_one(
+                    DailyNutritionRollup.user_id == rollup_user_id,
+                    DailyNutritionRollup.date == day
+                ).update(
+                    {"$set": {**values, "updated_at": now}},
+                    upsert=True,
+                    bulk_writer=bulk_writer
+                )
+                written += 1
+    
+    # Eliminar rollups de días que ya no tienen entradas
+    stale_ids: List = []
+    rollup_match = day_match(user_id, start, end)
+    async for rollup in DailyNutritionRollup.get_motor_collection().find(rollup_match, {"user_id": 1, "date": 1}):
+        if (rollup["user_id"], rollup["date"].date()) not in totals:
+            stale_ids.append(rollup["_id"])
+    if stale_ids:
+        await DailyNutritionRollup.get_motor_collection().delete_many({"_id": {"$in": stale_ids}})
+    
+    if user_id:
+        invalidate_advice(user_id)
+    else:
+        advice_cache.clear()
+    
+    logger.info(f"Rollups nutricionales reconstruidos: {written} escritos, {len(stale_ids)} eliminados")
+    return written
@@ -0,0 +1,60 @@
+from typing import Optional
+
+from models.nutrition import NutritionGoals
+from models.user import User, UserProfile, Goal
+
+# Campos del perfil de los que dependen las metas nutricionales
+TARGET_PROFILE_FIELDS = ("age", "weight", "height", "activity_level", "goal")
+
+ACTIVITY_MULTIPLIERS = {
+    "sedentary": 1.2,
+    "light": 1.375,
+    "moderate": 1.55,
+    "active": 1.725,
+    "very_active": 1.9
+}
+
+def calculate_nutrition_goals(profile: Optional[UserProfile]) -> NutritionGoals:
+    """Calcular metas nutricionales diarias a partir del perfil"""
+    goals = NutritionGoals()
+    if not profile:
+        return goals
+
+    # Agua basada en peso
+    if profile.weight:
+        goals.daily_water = round(profile.weight * 35)  # 35ml por kg
+
+    # Cálculo básico de calorías (Harris-Benedict)
+    if profile.age and profile.weight and profile.height:
+        # Fórmula para hombres (asumiendo, se puede ajustar)
+        bmr = 88.362 + (13.397 * profile.weight) + (4.799 * profile.height) - (5.677 * profile.age)
+
+        activity_level = profile.activity_level.value if profile.activity_level else None
+        multiplier = ACTIVITY_MULTIPLIERS.get(activity_level, 1.55)
+        daily_calories = bmr * multiplier
+
+        # Ajustar según objetivo
+        if profile.goal == Goal.WEIGHT_LOSS:
+            daily_calories -= 500  # Déficit de 500 cal
+        elif profile.goal == Goal.WEIGHT_GAIN:
+            daily_calories += 500  # Superávit de 500 cal
+
+        goals.daily_calories = round(daily_calories)
+        goals.daily_protein = round(profile.weight * 2.2)  # 2.2g por kg
+        goals.daily_carbs = round(daily_calories * 0.45 / 4)  # 45% de calorías
+        goals.daily_fats = round(daily_calories * 0.25 / 9)  # 25% de calorías
+
+    return goals
+
+def targets_changed(previous: Optional[UserProfile], current: Optional[UserProfile]) -> bool:
+    """Indicar si cambió algún campo del perfil que afecte las metas"""
+    return any(
+        getattr(previous, field, None) != getattr(current, field, None)
+        for field in TARGET_PROFILE_FIELDS
+    )
+
+def get_user_nutrition_goals(user: User) -> NutritionGoals:
+    """Metas guardadas del usuario; para cuentas sin metas se calculan sin persistir"""
+    if user.nutrition_goals is not None:
+        return user.nutrition_goals
+    return calculate_nutrition_goals(user.profile)
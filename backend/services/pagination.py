@@ -0,0 +1,66 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple
+
+from beanie import PydanticObjectId
+from fastapi import HTTPException, Response, status
+
+# Header con el cursor de la siguiente página; el cuerpo sigue siendo una lista
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def page_sort(sort_field: str) -> List[Tuple[str, int]]:
+    """Orden de las páginas de fetch_page (el índice debe cubrirlo)"""
+    return [(sort_field, -1), ("_id", -1)]
+
+def encode_cursor(sort_value: Any, document_id: Any) -> str:
+    """Codificar (valor de orden, _id) del último elemento como cursor opaco"""
+    raw = json.dumps([sort_value.isoformat(), str(document_id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, value_type: type = datetime) -> Tuple[Any, PydanticObjectId]:
+    """Decodificar un cursor generado por encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, document_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        parse = date.fromisoformat if value_type is date else datetime.fromisoformat
+        return parse(sort_value), PydanticObjectId(document_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginación inválido"
+        )
+
+async def fetch_page(
+    find_query,
+    sort_field: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    value_type: type = datetime
+) -> Tuple[List[Any], Optional[str]]:
+    """Obtener una página ordenada por (sort_field desc, _id desc) usando keyset
+    
+    El cursor filtra directamente sobre el índice, así que cada página cuesta lo
+    mismo sin importar qué tan profunda sea (sin skip/offset).
+    """
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, value_type)
+        find_query = find_query.find({"$or": [
+            {sort_field: {"$lt": sort_value}},
+            {sort_field: sort_value, "_id": {"$lt": last_id}}
+        ]})
+    
+    documents = await find_query.sort(page_sort(sort_field)).limit(limit + 1).to_list()
+    
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_cursor(getattr(last, sort_field), last.id)
+    
+    return documents, next_cursor
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    """Exponer el cursor de la siguiente página en la respuesta"""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,68 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from config import settings, logger
+
+# Fijar min/max al costo configurado hace que los hashes con otro costo
+# se marquen para actualización (rehash transparente al iniciar sesión)
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds
+)
+
+class PasswordHasher:
+    """Ejecuta bcrypt en un pool de hilos acotado para no bloquear el event loop"""
+    
+    def __init__(self, max_workers: int, queue_limit: int):
+        self.max_workers = max_workers
+        self.max_pending = max_workers + queue_limit
+        self._pending = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="bcrypt"
+        )
+    
+    async def _run(self, func, *args):
+        # Solo el hilo del event loop modifica el contador, no requiere lock
+        if self._pending >= self.max_pending:
+            logger.warning("Cola de hashing de contraseñas saturada")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servicio ocupado, intenta nuevamente en unos segundos",
+                headers={"Retry-After": "1"}
+            )
+        
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+    
+    async def hash(self, password: str) -> str:
+        """Generar hash bcrypt de una contraseña"""
+        return await self._run(pwd_context.hash, password)
+    
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Verificar contraseña contra su hash"""
+        return await self._run(pwd_context.verify, password, hashed_password)
+    
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verificar contraseña y devolver un nuevo hash si el costo cambió"""
+        return await self._run(pwd_context.verify_and_update, password, hashed_password)
+    
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+# Instancia global del servicio de hashing
+password_hasher = PasswordHasher(
+    max_workers=settings.password_hash_workers,
+    queue_limit=settings.password_hash_queue_limit
+)
@@ -0,0 +1,50 @@
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from beanie import Document
+from beanie.odm.utils.encoder import Encoder
+from pydantic import TypeAdapter
+
+_encoder = Encoder()
+
+@lru_cache(maxsize=None)
+def _field_adapter(model: type, field: str) -> TypeAdapter:
+    return TypeAdapter(model.model_fields[field].annotation)
+
+async def patch_document(
+    document: Document,
+    changes: Dict[str, Any],
+    on_change: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Escribir solo los campos que cambiaron usando $set en lugar de save()
+    
+    `on_change` son campos extra (p. ej. updated_at) que solo se escriben si
+    hubo algún cambio real. Devuelve el diccionario enviado en $set.
+    """
+    model = type(document)
+    updates: Dict[str, Any] = {}
+    
+    for field, value in changes.items():
+        new_value = _field_adapter(model, field).validate_python(value)
+        encoded = _encoder.encode(new_value)
+        if encoded != _encoder.encode(getattr(document, field, None)):
+            updates[field] = (new_value, encoded)
+    
+    if not updates:
+        return {}
+    
+    for field, value in (on_change or {}).items():
+        new_value = _field_adapter(model, field).validate_python(value)
+        updates[field] = (new_value, _encoder.encode(new_value))
+    
+    set_document = {field: encoded for field, (_, encoded) in updates.items()}
+    await model.get_motor_collection().update_one(
+        {"_id": document.id},
+        {"$set": set_document}
+    )
+    
+    # Reflejar los cambios en la instancia local ya validados
+    for field, (new_value, _) in updates.items():
+        setattr(document, field, new_value)
+    
+    return set_document
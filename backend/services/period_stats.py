@@ -0,0 +1,248 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Type
+
+import numpy as np
+from beanie import BulkWriter
+from pymongo.errors import BulkWriteError
+
+from config import logger
+from models.analytics import DailyStats, PeriodStats, WeeklyStats, MonthlyStats, MonthlyProgress
+from services.analytics_engine import DailyStatsFrame, FRAME_COLUMNS
+from services.queries import Query, period_stats_range
+
+METRICS = tuple(FRAME_COLUMNS)
+WEIGHT_INDEX = METRICS.index("weight")
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Reintentos de refresh_period_stats cuando otra escritura cambia los mismos períodos
+MAX_REFRESH_ATTEMPTS = 5
+DUPLICATE_KEY_ERROR = 11000
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+def week_end(day: date) -> date:
+    return week_start(day) + timedelta(days=6)
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def month_end(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+def _week_keys(dates: np.ndarray) -> np.ndarray:
+    # Días desde 1970-01-01 (jueves): el lunes de la semana es d - (d + 3) % 7
+    days = dates.astype(np.int64)
+    return days - (days + 3) % 7
+
+def _month_keys(dates: np.ndarray) -> np.ndarray:
+    return dates.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+
+# Modelo -> (inicio del período, fin del período, clave vectorizada por fila)
+PERIOD_MODELS: Dict[Type[PeriodStats], tuple] = {
+    WeeklyStats: (week_start, week_end, _week_keys),
+    MonthlyStats: (month_start, month_end, _month_keys),
+}
+
+def _compute_periods(frame: DailyStatsFrame, model: Type[PeriodStats]) -> Dict[date, dict]:
+    """Agregar el frame (ordenado por fecha) por período: inicio del período -> valores"""
+    if not len(frame):
+        return {}
+
+    _, end_of, keys_of = PERIOD_MODELS[model]
+    matrix = np.column_stack([frame[name] for name in METRICS])
+    keys, starts, day_counts = np.unique(keys_of(frame.dates), return_index=True, return_counts=True)
+    now = datetime.utcnow()
+
+    periods = {}
+    for key, start, day_count in zip(keys, starts, day_counts):
+        block = matrix[start:start + day_count]
+        counts = np.count_nonzero(~np.isnan(block), axis=0)
+        sums = np.nansum(block, axis=0)
+        # fmin/fmax ignoran NaN sin advertencias
+        mins = np.fmin.reduce(block, axis=0)
+        maxs = np.fmax.reduce(block, axis=0)
+        logged = np.flatnonzero(counts)
+
+        weights = block[:, WEIGHT_INDEX]
+        weights = weights[~np.isnan(weights) & (weights != 0)]
+
+        period_start = date.fromordinal(EPOCH_ORDINAL + int(key))
+        period_end = end_of(period_start)
+        periods[period_start] = {
+            "period_end": period_end,
+            "days_in_period": (period_end - period_start).days + 1,
+            "days_logged": int(day_count),
+            "sums": {METRICS[i]: float(sums[i]) for i in logged},
+            "counts": {METRICS[i]: int(counts[i]) for i in logged},
+            "mins": {METRICS[i]: float(mins[i]) for i in logged},
+            "maxs": {METRICS[i]: float(maxs[i]) for i in logged},
+            "first_weight": float(weights[0]) if len(weights) else None,
+            "last_weight": float(weights[-1]) if len(weights) else None,
+            "weight_days": int(len(weights)),
+            "updated_at": now
+        }
+    return periods
+
+def period_stats_query(model: Type[PeriodStats], user_id: str, start: date, end: date) -> Query:
+    """Consulta de los períodos que se solapan con [start, end]"""
+    start_of, _, _ = PERIOD_MODELS[model]
+    return period_stats_range(model, user_id, start_of(start), start_of(end))
+
+def _version_filter(version: int) -> dict:
+    # Los documentos anteriores al campo `version` no lo tienen: cuentan como 0
+    return {"version": version if version else {"$in": [0, None]}}
+
+async def _period_versions(model: Type[PeriodStats], user_id: str, start: date, end: date) -> Dict[date, int]:
+    """Versión actual de cada período existente que contiene los días [start, end]"""
+    cursor = model.get_motor_collection().find(
+        period_stats_query(model, user_id, start, end).filter,
+        {"_id": 0, "period_start": 1, "version": 1}
+    )
+    return {row["period_start"].date(): row.get("version") or 0 async for row in cursor}
+
+async def _write_periods(
+    model: Type[PeriodStats],
+    user_id: str,
+    periods: Dict[date, dict],
+    versions: Dict[date, int]
+) -> bool:
+    """Escribir los períodos solo si siguen en la versión leída
+
+    Devuelve False si otra escritura los cambió entretanto: el upsert de un período
+    con otra versión choca con el índice único y el borrado no lo encuentra.
+    """
+    if periods:
+        try:
+            async with BulkWriter() as bulk_writer:
+                for period_start, values in periods.items():
+                    await model.find_one(
+                        model.user_id == user_id,
+                        model.period_start == period_start,
+                        _version_filter(versions.get(period_start, 0))
+                    ).update({"$set": values, "$inc": {"version": 1}}, upsert=True, bulk_writer=bulk_writer)
+        except BulkWriteError as e:
+            if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details.get("writeErrors", [])):
+                raise
+            return False
+
+    # Períodos que quedaron sin días
+    empty = [period_start for period_start in versions if period_start not in periods]
+    if empty:
+        result = await model.get_motor_collection().delete_many({
+            "user_id": user_id,
+            "$or": [
+                {"period_start": datetime.combine(period_start, datetime.min.time()), **_version_filter(versions[period_start])}
+                for period_start in empty
+            ]
+        })
+        return result.deleted_count == len(empty)
+    return True
+
+async def refresh_period_stats(user_id: str, start: date, end: Optional[date] = None) -> None:
+    """Recalcular las semanas y meses que contienen los días [start, end] de un usuario
+
+    Lee solo los días de los períodos afectados (a lo sumo ~37 para un día) y
+    reemplaza sus documentos; los períodos que quedaron sin días se eliminan.
+    Las versiones se leen antes que los días, así que si otra escritura recalculó
+    los mismos períodos mientras tanto, se vuelve a leer y recalcular.
+    """
+    end = end or start
+    pending = list(PERIOD_MODELS)
+
+    for _ in range(MAX_REFRESH_ATTEMPTS):
+        versions = {model: await _period_versions(model, user_id, start, end) for model in pending}
+        frame = await DailyStatsFrame.load(
+            user_id,
+            min(week_start(start), month_start(start)),
+            max(week_end(end), month_end(end))
+        )
+
+        conflicted = []
+        for model in pending:
+            start_of, _, _ = PERIOD_MODELS[model]
+            first, last = start_of(start), start_of(end)
+            # El frame puede cubrir parcialmente otros períodos: solo se escriben los afectados
+            periods = {
+                period_start: values
+                for period_start, values in _compute_periods(frame, model).items()
+                if first <= period_start <= last
+            }
+            if not await _write_periods(model, user_id, periods, versions[model]):
+                conflicted.append(model)
+
+        if not conflicted:
+            return
+        pending = conflicted
+
+    logger.warning(
+        f"Agregados por período de {user_id} sin actualizar tras {MAX_REFRESH_ATTEMPTS} intentos "
+        f"({start} - {end}); ejecuta manage.py rebuild-period-stats"
+    )
+
+async def rebuild_period_stats(user_id: Optional[str] = None) -> Dict[str, int]:
+    """Reconstruir WeeklyStats y MonthlyStats desde todas las DailyStats (job de reparación)
+
+    Devuelve la cantidad de documentos escritos por colección.
+    """
+    written = {model.get_settings().name: 0 for model in PERIOD_MODELS}
+    user_ids = [user_id] if user_id else await DailyStats.get_motor_collection().distinct("user_id")
+
+    for owner_id in user_ids:
+        frame = await DailyStatsFrame.load(owner_id, date.min, date.max)
+        for model in PERIOD_MODELS:
+            periods = _compute_periods(frame, model)
+            await model.get_motor_collection().delete_many({"user_id": owner_id})
+            if periods:
+                await model.insert_many([
+                    model(user_id=owner_id, period_start=period_start, **values)
+                    for period_start, values in periods.items()
+                ])
+            written[model.get_settings().name] += len(periods)
+
+    logger.info(f"Agregados por período reconstruidos: {written}")
+    return written
+
+async def get_period_stats(model: Type[PeriodStats], user_id: str, start: date, end: date) -> List[PeriodStats]:
+    """Obtener los períodos que se solapan con [start, end], en orden cronológico"""
+    return await period_stats_query(model, user_id, start, end).find().to_list()
+
+async def period_stats_stamp(model: Type[PeriodStats], user_id: str, start: date, end: date) -> tuple:
+    """Huella de los períodos que se solapan con [start, end]
+
+    Cambia cuando una escritura de DailyStats en esos días recalcula o elimina un
+    período, en cualquier proceso; sirve para validar resultados en caché.
+    """
+    spec = period_stats_query(model, user_id, start, end)
+    rows = await model.get_motor_collection().find(
+        spec.filter,
+        {"_id": 0, "period_start": 1, "updated_at": 1}
+    ).sort(spec.sort).to_list(length=None)
+    return tuple((row["period_start"], row.get("updated_at")) for row in rows)
+
+def monthly_progress(months: List[MonthlyStats]) -> List[MonthlyProgress]:
+    """Calcular progreso mensual desde los agregados de cada mes"""
+    progress = []
+
+    for stats in months:
+        if stats.days_logged < 5:  # Necesitamos datos suficientes
+            continue
+
+        weight_change = None
+        if stats.weight_days >= 2:
+            weight_change = stats.last_weight - stats.first_weight
+
+        avg_calories = stats.sums.get("calories_consumed", 0) / stats.days_logged
+        avg_protein = stats.sums.get("protein_consumed", 0) / stats.days_logged
+
+        progress.append(MonthlyProgress(
+            month=stats.period_start.strftime("%Y-%m"),
+            weight_change=weight_change,
+            avg_calories=round(avg_calories, 1) if avg_calories else None,
+            avg_protein=round(avg_protein, 1) if avg_protein else None,
+            gym_sessions=int(stats.sums.get("gym_sessions", 0)),
+            # Días con datos / días del mes
+            consistency_score=round(stats.days_logged / stats.days_in_period * 100, 1)
+        ))
+
+    return progress
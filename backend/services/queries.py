@@ -0,0 +1,165 @@
+from datetime import date, datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Type
+from zoneinfo import ZoneInfo
+
+from beanie import Document
+
+from models.user import User
+from models.nutrition import FoodEntry, WaterEntry, DailyNutritionRollup, MealType, FoodCategory
+from models.analytics import DailyStats, PeriodStats
+from models.notification import NotificationLog, NotificationType
+from services.day_keys import day_bounds
+from services.pagination import page_sort
+
+class Query(NamedTuple):
+    """Filtro, orden y límite de una consulta de los routers
+
+    Los routers ejecutan estas consultas y `manage.py indexes` las verifica con
+    explain(), así que el filtro auditado es el mismo que se ejecuta. Los valores
+    ya están en formato BSON (fechas como datetime).
+    """
+    model: Type[Document]
+    filter: Dict[str, Any]
+    sort: Optional[List[Tuple[str, int]]] = None
+    limit: int = 0
+
+    def find(self):
+        """Consulta de Beanie con el filtro, el orden y el límite"""
+        query = self.model.find(self.filter)
+        if self.sort:
+            query = query.sort(self.sort)
+        if self.limit:
+            query = query.limit(self.limit)
+        return query
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
+def day_match(user_id: Optional[str], start: Optional[date], end: Optional[date]) -> dict:
+    """Filtro por rango de días sobre el campo `date`"""
+    match = {}
+    if user_id:
+        match["user_id"] = user_id
+    if start or end:
+        match["date"] = {}
+        if start:
+            match["date"]["$gte"] = _midnight(start)
+        if end:
+            match["date"]["$lte"] = datetime.combine(end, datetime.max.time())
+    return match
+
+def entry_day_match(user_id: Optional[str], start: Optional[date], end: Optional[date]) -> dict:
+    """Filtro de entradas por day_key, con el rango de fechas para las que aún no lo tienen"""
+    if not (start or end):
+        return day_match(user_id, None, None)
+
+    day_keys = {}
+    if start:
+        day_keys["$gte"] = start.isoformat()
+    if end:
+        day_keys["$lte"] = end.isoformat()
+
+    legacy = day_match(None, start, end)
+    legacy["day_key"] = None
+    match = {"$or": [{"day_key": day_keys}, legacy]}
+    if user_id:
+        match["user_id"] = user_id
+    return match
+
+def user_by_email(email: str) -> Query:
+    """Login y get_current_user"""
+    return Query(User, {"email": email}, limit=1)
+
+def _entry_range(user_id: str, tz: ZoneInfo, start: Optional[date], end: Optional[date]) -> dict:
+    # Los límites de cada día se calculan en la zona horaria del usuario
+    query: Dict[str, Any] = {"user_id": user_id}
+    if start or end:
+        query["date"] = {}
+        if start:
+            query["date"]["$gte"] = day_bounds(start, tz)[0]
+        if end:
+            query["date"]["$lt"] = day_bounds(end, tz)[1]
+    return query
+
+def food_entries_page(
+    user_id: str,
+    tz: ZoneInfo,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    meal_type: Optional[MealType] = None,
+    category: Optional[FoodCategory] = None,
+    limit: int = 50
+) -> Query:
+    """GET /nutrition/food (una página de fetch_page)"""
+    query = _entry_range(user_id, tz, start, end)
+    if meal_type:
+        query["meal_type"] = MealType(meal_type).value
+    if category:
+        query["category"] = FoodCategory(category).value
+    return Query(FoodEntry, query, page_sort("date"), limit + 1)
+
+def water_entries_page(
+    user_id: str,
+    tz: ZoneInfo,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = 50
+) -> Query:
+    """GET /nutrition/water (una página de fetch_page)"""
+    return Query(WaterEntry, _entry_range(user_id, tz, start, end), page_sort("date"), limit + 1)
+
+def day_entries(model: Type[Document], user_id: str, day: date) -> Query:
+    """Entradas de comida o agua de un día del usuario (igualdad sobre day_key)"""
+    return Query(model, {"user_id": user_id, "day_key": day.isoformat()}, [("date", 1)])
+
+def entries_since(model: Type[Document], user_id: str, since: date) -> Query:
+    """Entradas de comida o agua desde un día (GET /users/stats)"""
+    return Query(model, entry_day_match(user_id, since, None))
+
+def rollup_range(user_id: str, start: date, end: date) -> Query:
+    """Rollups nutricionales de un rango de días"""
+    return Query(DailyNutritionRollup, day_match(user_id, start, end))
+
+def daily_stats_page(user_id: str, start: date, end: date, limit: int = 30) -> Query:
+    """GET /analytics/daily-stats (una página de fetch_page)"""
+    return Query(
+        DailyStats,
+        {"user_id": user_id, "date": {"$gte": _midnight(start), "$lte": _midnight(end)}},
+        page_sort("date"),
+        limit + 1
+    )
+
+def daily_stats_range(user_id: str, start: date, end: date) -> Query:
+    """Días de un período en orden cronológico (frame de /analytics/summary, tendencias, agregados)"""
+    return Query(
+        DailyStats,
+        {"user_id": user_id, "date": {"$gte": _midnight(start), "$lte": _midnight(end)}},
+        [("date", 1)]
+    )
+
+def daily_stats_since(user_id: str, since: date) -> Query:
+    """Días registrados desde una fecha (GET /users/stats)"""
+    return Query(DailyStats, {"user_id": user_id, "date": {"$gte": _midnight(since)}})
+
+def recent_daily_stats(user_id: str, since: date, limit: int = 7) -> Query:
+    """Últimos días registrados desde una fecha (GET /analytics/goals-progress)"""
+    return Query(DailyStats, {"user_id": user_id, "date": {"$gte": _midnight(since)}}, [("date", -1)], limit)
+
+def period_stats_range(model: Type[PeriodStats], user_id: str, first_start: date, last_start: date) -> Query:
+    """Períodos cuyo inicio está entre dos inicios de período, en orden cronológico"""
+    return Query(
+        model,
+        {"user_id": user_id, "period_start": {"$gte": _midnight(first_start), "$lte": _midnight(last_start)}},
+        [("period_start", 1)]
+    )
+
+def notification_history_page(
+    user_id: str,
+    notification_type: Optional[NotificationType] = None,
+    limit: int = 50
+) -> Query:
+    """GET /notifications/history (una página de fetch_page)"""
+    query: Dict[str, Any] = {"user_id": user_id}
+    if notification_type:
+        query["notification_type"] = NotificationType(notification_type).value
+    return Query(NotificationLog, query, page_sort("sent_at"), limit + 1)
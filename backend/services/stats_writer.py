@@ -0,0 +1,194 @@
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from models.analytics import DailyStats, DailyStatsCreate, HealthMetric, NutritionMetrics
+from services.analytics_cache import invalidate_analytics
+from services.period_stats import refresh_period_stats
+from services.trend_engine import record_trend_day, invalidate_trend_state
+from services.day_keys import backfill_day_keys
+from services.nutrition_rollup import get_rollup_range, rebuild_rollups, rollup_values_to_nutrition_metrics
+
+# Contadores de actividad que se acumulan entre registros del mismo día
+ADDITIVE_ACTIVITY_FIELDS = [
+    "gym_sessions",
+    "cardio_minutes",
+    "strength_training_minutes",
+    "work_minutes",
+    "leisure_minutes",
+    "rest_minutes",
+    "study_minutes",
+    "social_minutes",
+    "calories_burned"
+]
+
+def build_daily_stats_update(
+    user_id: str,
+    target_date: date,
+    stats_data: DailyStatsCreate,
+    nutrition_metrics: Optional[NutritionMetrics] = None
+) -> Dict[str, Any]:
+    """Construir un update con upsert para DailyStats
+    
+    Las métricas de actividad se suman con $inc, las de salud y las notas se
+    reemplazan con $set y los campos de creación van en $setOnInsert.
+    """
+    now = datetime.now()
+    activity = stats_data.activity_metrics
+    
+    inc = {
+        f"activity_metrics.{field}": (getattr(activity, field, None) or 0) if activity else 0
+        for field in ADDITIVE_ACTIVITY_FIELDS
+    }
+    to_set: Dict[str, Any] = {"updated_at": now}
+    on_insert: Dict[str, Any] = {
+        "user_id": user_id,
+        "date": target_date,
+        "created_at": now
+    }
+    
+    if activity and activity.steps:
+        to_set["activity_metrics.steps"] = activity.steps
+    
+    if stats_data.health_metrics:
+        to_set["health_metrics"] = stats_data.health_metrics.model_dump()
+    else:
+        on_insert["health_metrics"] = HealthMetric().model_dump()
+    
+    if stats_data.notes:
+        to_set["notes"] = stats_data.notes
+    else:
+        on_insert["notes"] = None
+    
+    if nutrition_metrics is not None:
+        to_set["nutrition_metrics"] = nutrition_metrics.model_dump()
+    else:
+        on_insert["nutrition_metrics"] = NutritionMetrics().model_dump()
+    
+    return {"$inc": inc, "$set": to_set, "$setOnInsert": on_insert}
+
+
+async def sync_nutrition_metrics(user_id: str, start: date, end: date) -> int:
+    """Copiar los totales de los rollups a las DailyStats existentes de un rango de días"""
+    rollups = await get_rollup_range(user_id, start, end)
+    collection = DailyStats.get_motor_collection()
+    operations: List[UpdateOne] = []
+    updated = 0
+    
+    cursor = collection.find(
+        {
+            "user_id": user_id,
+            "date": {
+                "$gte": datetime.combine(start, datetime.min.time()),
+                "$lte": datetime.combine(end, datetime.max.time())
+            }
+        },
+        {"date": 1}
+    )
+    async for stats in cursor:
+        metrics = rollup_values_to_nutrition_metrics(rollups.get(stats["date"].date(), {}))
+        operations.append(UpdateOne({"_id": stats["_id"]}, {"$set": {"nutrition_metrics": metrics.model_dump()}}))
+        if len(operations) >= 1000:
+            await collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+    
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+        updated += len(operations)
+    if updated:
+        await on_daily_stats_written(user_id, start, end)
+    return updated
+
+async def rekey_user_days(user_id: str) -> None:
+    """Pasar los días de un usuario a su zona horaria actual
+
+    Recalcula day_key de sus entradas, reconstruye sus rollups y copia los
+    totales a sus DailyStats (las fechas de DailyStats no cambian).
+    """
+    await backfill_day_keys(user_id=user_id, recompute=True)
+    await rebuild_rollups(user_id=user_id)
+    
+    first = await DailyStats.find(DailyStats.user_id == user_id).sort(+DailyStats.date).first_or_none()
+    if first:
+        last = await DailyStats.find(DailyStats.user_id == user_id).sort(-DailyStats.date).first_or_none()
+        await sync_nutrition_metrics(user_id, first.date, last.date)
+
+async def on_daily_stats_written(
+    user_id: str,
+    start: date,
+    end: Optional[date] = None,
+    stats: Optional[DailyStats] = None
+) -> None:
+    """Actualizar los derivados de DailyStats tras escribir los días [start, end]
+
+    Recalcula semanas y meses afectados, y después invalida los resúmenes en caché
+    de esas fechas y lleva el día escrito (`stats`) al estado de tendencias o lo
+    descarta. Invalidar al final evita que un resumen calculado durante el
+    recálculo quede en caché con los MonthlyStats anteriores.
+    """
+    await refresh_period_stats(user_id, start, end)
+    invalidate_analytics(user_id, start, end)
+    if stats is not None:
+        record_trend_day(user_id, stats)
+    else:
+        invalidate_trend_state(user_id)
+
+def _merge_duplicate_stats(documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combinar documentos DailyStats del mismo día (ordenados por updated_at)
+
+    Suma los contadores de actividad, como lo haría $inc, y conserva los pasos,
+    las métricas de salud y las notas más recientes que tengan valor, como $set.
+    """
+    activities = [doc.get("activity_metrics") or {} for doc in documents]
+    activity: Dict[str, Any] = {}
+    for field in ADDITIVE_ACTIVITY_FIELDS:
+        present = [values[field] for values in activities if values.get(field) is not None]
+        # calories_burned es opcional: sin registros queda en None
+        activity[field] = sum(present) if present else (None if field == "calories_burned" else 0)
+    activity["steps"] = next((values["steps"] for values in reversed(activities) if values.get("steps")), None)
+
+    latest = documents[-1]
+
+    health = next(
+        (doc["health_metrics"] for doc in reversed(documents)
+         if any(value is not None for value in (doc.get("health_metrics") or {}).values())),
+        latest.get("health_metrics") or HealthMetric().model_dump()
+    )
+    notes = next((doc["notes"] for doc in reversed(documents) if doc.get("notes")), None)
+
+    merged = {"activity_metrics": activity, "health_metrics": health, "notes": notes}
+    created = [doc["created_at"] for doc in documents if doc.get("created_at")]
+    if created:
+        merged["created_at"] = min(created)
+    return merged
+
+async def dedupe_daily_stats(collection, user_id: Optional[str] = None) -> Dict[str, int]:
+    """Fusionar los DailyStats duplicados por (user_id, date) en un solo documento
+
+    Trabaja sobre la colección de Motor sin inicializar Beanie, porque el índice
+    único user_date_unique no se puede crear mientras existan duplicados. Conserva
+    el documento más reciente y elimina el resto. Devuelve los días fusionados y
+    los documentos eliminados.
+    """
+    match: Dict[str, Any] = {"user_id": user_id} if user_id else {}
+    groups = collection.aggregate([
+        {"$match": match},
+        {"$group": {"_id": {"user_id": "$user_id", "date": "$date"}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+
+    merged = removed = 0
+    async for group in groups:
+        documents = await collection.find({"_id": {"$in": group["ids"]}}).to_list(length=None)
+        # Sin updated_at cuentan como los más antiguos; a igualdad decide el _id
+        documents.sort(key=lambda doc: (doc.get("updated_at") or datetime.min, doc["_id"]))
+        keep, *duplicates = reversed(documents)
+
+        await collection.update_one({"_id": keep["_id"]}, {"$set": _merge_duplicate_stats(documents)})
+        result = await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in duplicates]}})
+        merged += 1
+        removed += result.deleted_count
+
+    return {"merged": merged, "removed": removed}
@@ -0,0 +1,28 @@
+import hashlib
+import time
+
+from jose import jwt
+
+from config import settings
+from services.cache import LRUCache, register_cache
+
+# Payloads de JWT ya verificados, indexados por el digest del token
+token_cache = register_cache("tokens", LRUCache(max_size=settings.token_cache_max_size))
+
+def decode_access_token(token: str) -> dict:
+    """Decodificar un JWT, reutilizando la verificación previa si el token ya fue visto"""
+    digest = hashlib.sha256(token.encode()).digest()
+    
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
+    
+    # Lanza JWTError si la firma o los claims no son válidos
+    payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    
+    # Se guarda solo hasta su expiración, así un acierto nunca devuelve un token vencido
+    expires_in = payload.get("exp", 0) - time.time()
+    if expires_in > 0:
+        token_cache.set(digest, payload, ttl_seconds=expires_in)
+    
+    return payload
@@ -0,0 +1,234 @@
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import settings
+from models.analytics import MetricTrend, TrendDirection, WeeklyTrend
+from services.analytics_engine import DailyStatsFrame, FRAME_COLUMNS
+from services.cache import LRUCache, register_cache
+
+# Todas las métricas de HealthMetric, NutritionMetrics y ActivityMetrics
+TREND_METRICS = tuple(FRAME_COLUMNS)
+
+# Ventanas de media móvil en días calendario; el estado guarda la más larga
+WINDOWS = (7, 14, 30)
+HISTORY_DAYS = max(WINDOWS)
+
+# Variación porcentual semanal por debajo de la cual la tendencia es estable
+STABLE_THRESHOLD = 1.0
+
+# Estado de tendencias por usuario, actualizado en O(1) con cada día nuevo. Es por
+# proceso: el TTL acota cuánto tarda en verse una escritura atendida por otro worker
+trend_states = register_cache(
+    "trend_states",
+    LRUCache(max_size=settings.trend_state_cache_max_size, ttl_seconds=settings.trend_state_ttl_seconds)
+)
+
+def _window_mean(rows: np.ndarray) -> np.ndarray:
+    """Promedio por columna ignorando NaN (NaN si la columna no tiene valores)"""
+    counts = np.count_nonzero(~np.isnan(rows), axis=0)
+    sums = np.nansum(rows, axis=0)
+    return np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+
+def _optional(value: float, digits: int = 2) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+def _direction(percentage: float) -> Optional[TrendDirection]:
+    if np.isnan(percentage):
+        return None
+    if percentage > STABLE_THRESHOLD:
+        return TrendDirection.UP
+    if percentage < -STABLE_THRESHOLD:
+        return TrendDirection.DOWN
+    return TrendDirection.STABLE
+
+class TrendState:
+    """Estado incremental de tendencias: los últimos 30 días calendario y un EWMA por métrica
+
+    Los días se guardan en un buffer circular indexado por el ordinal de la fecha,
+    así que las ventanas quedan alineadas al calendario y los días sin registro
+    cuentan como huecos (NaN) en lugar de desplazar la serie. Agregar un día
+    cuesta O(1) respecto del largo del historial.
+    """
+
+    def __init__(self, ewma_span: int = 7):
+        self.alpha = 2 / (ewma_span + 1)
+        self.buffer = np.full((HISTORY_DAYS, len(TREND_METRICS)), np.nan)
+        self.last_day: Optional[date] = None
+        self.ewma = np.full(len(TREND_METRICS), np.nan)
+        # Ordinal del último día con valor de cada métrica (para decaer el EWMA según el hueco)
+        self.ewma_seen = np.full(len(TREND_METRICS), np.nan)
+        # EWMA antes del último día, para poder reemplazar ese día si se vuelve a escribir
+        self._previous_ewma = (self.ewma.copy(), self.ewma_seen.copy())
+
+    @classmethod
+    def from_frame(cls, frame: DailyStatsFrame, since: Optional[date] = None) -> "TrendState":
+        """Construir el estado recorriendo un período ya cargado (ordenado por fecha)"""
+        state = cls()
+        values = np.column_stack([frame[name] for name in TREND_METRICS])
+        for day, row in zip(frame.dates.astype(object), values):
+            if since is None or day >= since:
+                state.add_day(day, row)
+        return state
+
+    def add_day(self, day: date, values: np.ndarray) -> None:
+        """Incorporar un día posterior al último, o reemplazar el último
+
+        Los días anteriores al último no se admiten: requieren reconstruir el estado.
+        """
+        ordinal = day.toordinal()
+        if self.last_day is not None:
+            last = self.last_day.toordinal()
+            if ordinal < last:
+                raise ValueError(f"El día {day} es anterior al último del estado ({self.last_day})")
+            if ordinal == last:
+                self.ewma, self.ewma_seen = (array.copy() for array in self._previous_ewma)
+            else:
+                # Vaciar los días sin registro hasta el nuevo (a lo sumo HISTORY_DAYS filas)
+                for gap in range(last + 1, min(ordinal, last + HISTORY_DAYS) + 1):
+                    self.buffer[gap % HISTORY_DAYS] = np.nan
+
+        self._previous_ewma = (self.ewma.copy(), self.ewma_seen.copy())
+        values = np.asarray(values, dtype=np.float64)
+        self.buffer[ordinal % HISTORY_DAYS] = values
+        self.last_day = day
+
+        # EWMA por día calendario: un hueco de n días decae como n pasos sin observación
+        observed = ~np.isnan(values)
+        first = observed & np.isnan(self.ewma)
+        update = observed & ~first
+        self.ewma[first] = values[first]
+        weight = 1 - (1 - self.alpha) ** (ordinal - self.ewma_seen[update])
+        self.ewma[update] += weight * (values[update] - self.ewma[update])
+        self.ewma_seen[observed] = ordinal
+
+    def _window(self, as_of: date) -> np.ndarray:
+        """Filas de los últimos HISTORY_DAYS días hasta `as_of` (fila 0 = as_of), NaN si no hay datos"""
+        ordinals = as_of.toordinal() - np.arange(HISTORY_DAYS)
+        rows = self.buffer[ordinals % HISTORY_DAYS]
+        if self.last_day is None:
+            rows[:] = np.nan
+        else:
+            last = self.last_day.toordinal()
+            rows[(ordinals > last) | (ordinals <= last - HISTORY_DAYS)] = np.nan
+        return rows
+
+    def _aggregates(self, as_of: date) -> Dict[str, np.ndarray]:
+        rows = self._window(as_of)
+        aggregates = {f"moving_average_{size}": _window_mean(rows[:size]) for size in WINDOWS}
+        previous_week = _window_mean(rows[7:14])
+        change = aggregates["moving_average_7"] - previous_week
+        valid = ~np.isnan(change) & (previous_week != 0)
+        aggregates["previous_week"] = previous_week
+        aggregates["change"] = change
+        aggregates["percentage"] = np.divide(
+            change * 100, np.abs(previous_week), out=np.full(change.shape, np.nan), where=valid
+        )
+        aggregates["days_with_data"] = np.count_nonzero(~np.isnan(rows), axis=0)
+        return aggregates
+
+    def snapshot(self, as_of: date) -> List[MetricTrend]:
+        """Medias móviles, EWMA y variación semanal de cada métrica con datos, a una fecha"""
+        aggregates = self._aggregates(as_of)
+        trends = []
+        for i, name in enumerate(TREND_METRICS):
+            if not aggregates["days_with_data"][i] and np.isnan(self.ewma[i]):
+                continue
+            trends.append(MetricTrend(
+                metric_name=name,
+                section=FRAME_COLUMNS[name][0],
+                **{f"moving_average_{size}": _optional(aggregates[f"moving_average_{size}"][i]) for size in WINDOWS},
+                ewma=_optional(self.ewma[i]),
+                week_over_week_change=_optional(aggregates["change"][i]),
+                week_over_week_percentage=_optional(aggregates["percentage"][i], 1),
+                direction=_direction(aggregates["percentage"][i]),
+                days_with_data=int(aggregates["days_with_data"][i])
+            ))
+        return trends
+
+def weekly_trends(frame: DailyStatsFrame, end_date: date) -> List[WeeklyTrend]:
+    """Tendencias semanales: la semana calendario que termina en `end_date` vs la anterior"""
+    if not len(frame):
+        return []
+
+    state = TrendState.from_frame(frame, since=end_date - timedelta(days=13))
+    aggregates = state._aggregates(end_date)
+
+    trends = []
+    for i, name in enumerate(TREND_METRICS):
+        percentage = aggregates["percentage"][i]
+        if np.isnan(percentage):
+            continue
+        trends.append(WeeklyTrend(
+            metric_name=name,
+            current_value=round(float(aggregates["moving_average_7"][i]), 2),
+            previous_value=round(float(aggregates["previous_week"][i]), 2),
+            change_percentage=round(float(percentage), 1),
+            direction=_direction(percentage)
+        ))
+    return trends
+
+async def build_trend_state(user_id: str, end: date) -> TrendState:
+    """Construir el estado con el historial configurado hasta `end`"""
+    start = end - timedelta(days=settings.trend_history_days)
+    return TrendState.from_frame(await DailyStatsFrame.load(user_id, start, end))
+
+class _TrendEntry:
+    """Entrada de trend_states: el estado hasta `today` (None mientras se construye)
+
+    `generation` cambia con cada escritura, para no guardar un estado reconstruido
+    con días leídos antes de esa escritura.
+    """
+    __slots__ = ("state", "today", "generation")
+
+    def __init__(self, today: date):
+        self.state: Optional[TrendState] = None
+        self.today = today
+        self.generation = 0
+
+async def get_trend_state(user_id: str, today: date) -> TrendState:
+    """Obtener el estado de tendencias del usuario hasta hoy (en caché o reconstruido)"""
+    entry = trend_states.get(user_id)
+    if entry is not None and entry.today == today and entry.state is not None:
+        return entry.state
+
+    if entry is None or entry.today != today:
+        entry = _TrendEntry(today)
+        trend_states.set(user_id, entry)
+    generation = entry.generation
+
+    # Hasta hoy: un día con fecha futura no debe dejar el estado más allá de las consultas
+    state = await build_trend_state(user_id, today)
+    # Si hubo una escritura durante la carga el estado puede no incluirla: no se guarda
+    if entry.generation == generation and trend_states.get(user_id) is entry:
+        entry.state = state
+    return state
+
+def record_trend_day(user_id: str, stats) -> None:
+    """Llevar una escritura de DailyStats al estado en caché
+
+    Un día igual o posterior al último (hasta hoy) se incorpora en O(1); uno
+    anterior invalida el estado, que se reconstruye en la próxima consulta, y uno
+    posterior a hoy no forma parte del estado.
+    """
+    entry = trend_states.get(user_id)
+    if entry is None:
+        return
+    entry.generation += 1
+    state = entry.state
+    if state is None or stats.date > entry.today:
+        return
+    if state.last_day is not None and stats.date < state.last_day:
+        trend_states.invalidate(user_id)
+        return
+    state.add_day(stats.date, np.array([
+        getattr(getattr(stats, section), field) for section, field in FRAME_COLUMNS.values()
+    ], dtype=np.float64))
+
+def invalidate_trend_state(user_id: str) -> None:
+    """Descartar el estado de tendencias de un usuario"""
+    entry = trend_states.get(user_id)
+    if entry is not None:
+        entry.generation += 1
+    trend_states.invalidate(user_id)
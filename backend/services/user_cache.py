@@ -0,0 +1,20 @@
+from config import settings
+from services.cache import LRUCache, register_cache
+
+# Caché de usuarios autenticados indexada por el "sub" del token (email)
+user_cache = register_cache("users", LRUCache(
+    max_size=settings.user_cache_max_size,
+    ttl_seconds=settings.user_cache_ttl_seconds
+))
+
+def get_cached_user(email: str):
+    """Obtener usuario desde la caché"""
+    return user_cache.get(email)
+
+def cache_user(user) -> None:
+    """Guardar usuario resuelto en la caché"""
+    user_cache.set(user.email, user)
+
+def invalidate_cached_user(email: str) -> None:
+    """Invalidar usuario en caché tras una escritura"""
+    user_cache.invalidate(email)
@@ -198,6 +198,11 @@ class ApiService {
     return this.get(`/api/nutrition/daily-summary${params}`);
   }
 
+  async getNutritionRangeSummary(startDate, endDate) {
+    const params = new URLSearchParams({ start_date: startDate, end_date: endDate }).toString();
+    return this.get(`/api/nutrition/range-summary?${params}`);
+  }
+
   async getNutritionAdvice(date = null) {
     const params = date ? `?target_date=${date}` : '';
     return this.get(`/api/nutrition/advice${params}`);
@@ -242,6 +247,21 @@ class ApiService {
     return this.get('/api/analytics/goals-progress');
   }
 
+  async getWeeklyStats(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.get(`/api/analytics/weekly-stats${queryString ? `?${queryString}` : ''}`);
+  }
+
+  async getMonthlyStats(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.get(`/api/analytics/monthly-stats${queryString ? `?${queryString}` : ''}`);
+  }
+
+  async getAnalyticsTrends(asOf = null) {
+    const params = asOf ? `?as_of=${asOf}` : '';
+    return this.get(`/api/analytics/trends${params}`);
+  }
+
   // === ENDPOINTS DE NOTIFICACIONES ===
   
   async getNotificationSettings() {